@@ -0,0 +1,278 @@
+import array, collections, csv, itertools, operator, os, sys
+
+import MaturityEvaluator, Runner, Tracing
+
+# PyArrow is optional. Without it the tables are only saved as CSV.
+try:
+    import pyarrow, pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Catalogue-wide analytics. The catalogue is exported into tables of
+# services, operations, parameters and service categories, with a column for
+# each check made by MaturityEvaluator, so that questions about the whole
+# catalogue are answered from compact array module columns rather than by
+# walking the Resources again. Text columns are stored as integer codes into
+# a list of their distinct values, so that grouping by them is a count of
+# codes.
+
+# Column types: bool and int columns are arrays of that typecode, text
+# columns are arrays of codes
+typecodes = {'bool': 'B', 'int': 'i', 'text': 'i'}
+
+
+class Table:
+
+    def __init__(self, name, columns):
+        # columns is a list of (name, type) pairs
+        self.name = name
+        self.types = dict(columns)
+        self.names = [column for column, kind in columns]
+        self.columns = {column: array.array(typecodes[kind]) for column, kind in columns}
+        # The distinct values of each text column, and their codes
+        self.values = {column: [] for column, kind in columns if kind == 'text'}
+        self.codes = {column: {} for column in self.values}
+
+    def __len__(self):
+        return len(self.columns[self.names[0]])
+
+    def append(self, **row):
+        # Returns the index of the new row
+        index = len(self)
+        for column in self.names:
+            value = row[column]
+            if column in self.codes:
+                codes = self.codes[column]
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(self.values[column])
+                    self.values[column].append(value)
+                value = code
+            self.columns[column].append(value)
+        return index
+
+    def finish(self):
+        # Called once all the rows are added
+        del self.codes
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def decoded(self, column):
+        # The values of a column, with text columns decoded
+        values = self.columns[column]
+        if column in self.values:
+            return [self.values[column][code] for code in values]
+        if self.types[column] == 'bool':
+            return [bool(value) for value in values]
+        return [int(value) for value in values]
+
+    def writeCSV(self, path):
+        tmpname = path + '.tmp'
+        with open(tmpname, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.names)
+            writer.writerows(zip(*[self.decoded(column) for column in self.names]))
+        os.replace(tmpname, path)
+
+    def writeParquet(self, path):
+        # Text columns are saved as dictionary arrays, as they are held here
+        arrays = []
+        for column in self.names:
+            if column in self.values:
+                arrays.append(pyarrow.DictionaryArray.from_arrays(
+                    pyarrow.array(self.columns[column], type=pyarrow.int32()), pyarrow.array(self.values[column], type=pyarrow.string())))
+            else:
+                arrays.append(pyarrow.array(self.decoded(column), type=pyarrow.bool_() if self.types[column] == 'bool' else pyarrow.int32()))
+        pyarrow.parquet.write_table(pyarrow.Table.from_arrays(arrays, names=self.names), path)
+
+
+# Operations on columns
+
+def count(mask):
+    # The number of true values in a bool column
+    return mask.count(1)
+
+
+def andNot(a, b):
+    # a and not b, for bool columns (1 > 0 is the only true case)
+    return array.array('B', map(operator.gt, a, b))
+
+
+def select(values, mask):
+    # The values of a column in the rows where mask is true
+    return array.array(values.typecode, itertools.compress(values, mask))
+
+
+def countBy(table, column):
+    # The number of rows with each value of a text column, most common first
+    counts = collections.Counter(table[column]).items()
+    return sorted(((table.values[column][code], n) for code, n in counts if n),
+        key=lambda item: (-item[1], item[0]))
+
+
+class Tables:
+
+    def __init__(self):
+        self.services = Table('services', [
+            ('service', 'text'), ('id', 'text'), ('name', 'text'), ('provider', 'text'),
+            ('maturity', 'int'), ('publicMaturity', 'int'),
+            ('described', 'bool'), ('descriptionNeedsImproving', 'bool'),
+            ('documented', 'bool'), ('documentationProblems', 'bool'),
+            ('licensed', 'bool'), ('contact', 'bool'), ('categorised', 'bool'),
+            ('soapVariants', 'int'), ('restVariants', 'int'), ('missingWSDL', 'bool'),
+            ('operations', 'int')])
+        self.operations = Table('operations', [
+            ('serviceRow', 'int'), ('variant', 'text'), ('protocol', 'text'), ('name', 'text'),
+            ('described', 'bool'), ('inputs', 'int'), ('outputs', 'int')])
+        self.parameters = Table('parameters', [
+            ('serviceRow', 'int'), ('operationRow', 'int'), ('name', 'text'),
+            ('input', 'bool'), ('described', 'bool')])
+        self.categories = Table('categories', [('serviceRow', 'int'), ('category', 'text')])
+        self.tables = (self.services, self.operations, self.parameters, self.categories)
+
+    def add(self, service, links):
+        # Add the rows for a service, using the same checks as MaturityEvaluator
+        summary = service.summary().service.summary
+        row = len(self.services)
+        operations = 0
+        soapVariants = restVariants = 0
+        missingWSDL = False
+        for variant in service.variants:
+            resource = variant.resource()
+            if hasattr(resource, 'soap_service'):
+                soapVariants += 1
+                interface = resource.soap_service
+                missingWSDL = missingWSDL or not MaturityEvaluator.hasWSDL(interface)
+                for operation in interface.operations:
+                    soap_operation = operation.resource().soap_operation
+                    self.addOperation(row, variant.name, 'SOAP', soap_operation.name,
+                        MaturityEvaluator.isDescribed(soap_operation, soap=True),
+                        soap_operation.inputs or [], soap_operation.outputs or [], True)
+                    operations += 1
+            else:
+                restVariants += 1
+                for operation in resource.rest_service.resources:
+                    for method in operation.resource().rest_resource.methods:
+                        rest_method = method.resource().rest_method
+                        self.addOperation(row, variant.name, 'REST', method.endpoint_label,
+                            MaturityEvaluator.isDescribed(method),
+                            rest_method.inputs.parameters or [], rest_method.outputs.parameters or [], False)
+                        operations += 1
+        for category in summary.categories:
+            self.categories.append(serviceRow=row, category=category.name)
+        providers = [deployment.provider.name for deployment in service.deployments]
+        maturity = MaturityEvaluator.evaluate(service, links).maturity()
+        publicMaturity = MaturityEvaluator.evaluate(service, links, public=True).maturity()
+        descriptionAction = MaturityEvaluator.descriptionAction(service, summary)
+        self.services.append(
+            service=service.self,
+            id=service.self.split('/')[-1],
+            name=service.name,
+            # Services are counted under the provider of their first deployment
+            provider=(providers[0] if providers else None) or '',
+            maturity=-1 if maturity is None else maturity,
+            publicMaturity=-1 if publicMaturity is None else publicMaturity,
+            described=descriptionAction != 'Add service description',
+            descriptionNeedsImproving=descriptionAction == 'Improve service description',
+            documented=bool(summary.documentation_urls),
+            documentationProblems=any(MaturityEvaluator.linkAction(url, links)
+                for url in summary.documentation_urls or []),
+            licensed=bool(summary.licenses),
+            contact=bool(summary.contacts),
+            categorised=MaturityEvaluator.hasCategory(summary),
+            soapVariants=soapVariants,
+            restVariants=restVariants,
+            missingWSDL=missingWSDL,
+            operations=operations)
+
+    def addOperation(self, serviceRow, variant, protocol, name, described, inputs, outputs, soap):
+        row = self.operations.append(serviceRow=serviceRow, variant=variant, protocol=protocol, name=name,
+            described=described, inputs=len(inputs), outputs=len(outputs))
+        for input, parameters in ((True, inputs), (False, outputs)):
+            for parameter in parameters:
+                self.parameters.append(serviceRow=serviceRow, operationRow=row, name=parameter.name,
+                    input=input, described=MaturityEvaluator.isDescribed(parameter, soap))
+
+    def finish(self):
+        for table in self.tables:
+            table.finish()
+
+    def summary(self):
+        services = self.services
+        parameters = self.parameters
+        undescribedInputs = andNot(parameters['input'], parameters['described'])
+        maturity = collections.Counter(services.decoded('maturity'))
+        return {
+            'services': len(services),
+            'operations': len(self.operations),
+            'parameters': len(parameters),
+            'withoutDescription': len(services) - count(services['described']),
+            'withoutDocumentation': len(services) - count(services['documented']),
+            'withDocumentationProblems': count(services['documentationProblems']),
+            'withoutContact': len(services) - count(services['contact']),
+            'withoutLicence': len(services) - count(services['licensed']),
+            'withoutCategory': len(services) - count(services['categorised']),
+            'withoutWSDL': count(services['missingWSDL']),
+            'undescribedOperations': len(self.operations) - count(self.operations['described']),
+            'undescribedInputs': count(undescribedInputs),
+            'withUndescribedInputs': len(set(select(parameters['serviceRow'], undescribedInputs))),
+            'maturity': {('none' if level < 0 else str(level)): n for level, n in sorted(maturity.items())},
+            'byProvider': countBy(services, 'provider'),
+            'byCategory': countBy(self.categories, 'category')
+        }
+
+    def printSummary(self):
+        summary = self.summary()
+        print('%d services, %d operations, %d parameters' % (summary['services'], summary['operations'], summary['parameters']))
+        for key, label in (('withoutDescription', 'Services without a description'),
+                ('withoutDocumentation', 'Services without documentation links'),
+                ('withDocumentationProblems', 'Services with documentation link problems'),
+                ('withoutContact', 'Services without a contact'),
+                ('withoutLicence', 'Services without a licence'),
+                ('withoutCategory', 'Services without a category'),
+                ('withoutWSDL', 'Services with a SOAP variant without a WSDL'),
+                ('withUndescribedInputs', 'Services with undescribed inputs'),
+                ('undescribedOperations', 'Undescribed operations'),
+                ('undescribedInputs', 'Undescribed inputs')):
+            print('%-45s %6d' % (label, summary[key]))
+        print('Maturity: %s' % ', '.join('level %s: %d' % item for item in summary['maturity'].items()))
+        for key, label in (('byProvider', 'Services by provider'), ('byCategory', 'Services by category')):
+            print('%s:' % label)
+            for value, n in summary[key]:
+                print('%6d  %s' % (n, value or '(none)'))
+
+    def save(self, directory):
+        # Saves each table as CSV, and as Parquet if PyArrow is available
+        os.makedirs(directory, exist_ok=True)
+        for table in self.tables:
+            table.writeCSV(os.path.join(directory, table.name + '.csv'))
+            if pyarrow is not None:
+                table.writeParquet(os.path.join(directory, table.name + '.parquet'))
+
+
+def build(services, links):
+    tables = Tables()
+    for service in services:
+        with Tracing.service(service.self), Tracing.span('tabulate'):
+            tables.add(service, links)
+    tables.finish()
+    return tables
+
+
+def export(directory, run=None):
+    with Runner.session(run) as run:
+        bdc = run.catalogue
+        services = run.services()
+        for service in services:
+            with Tracing.service(service.self), Tracing.span('fetch'):
+                bdc.prefetch(service)
+        run.checkLinks(services)
+        tables = build(services, run.links)
+        tables.save(directory)
+        tables.printSummary()
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit('usage: python3 CatalogueTables.py DIRECTORY')
+    export(sys.argv[1])
@@ -1,11 +1,75 @@
-import json
+import concurrent.futures, hashlib, json, threading, time
 import requests
 from requests.auth import HTTPBasicAuth
 
+import Tracing, Transport
+
+
+class VersionConflict(RuntimeError):
+
+    # Confluence refused to store a page, probably because it was changed
+    # after we read it. Publishing again will re-read the page.
+    pass
+
+
+def storeError(error):
+    # The exception for a storePage error. Only an out of date version is
+    # worth retrying; other errors, such as missing permissions or invalid
+    # content, fail the same way every time.
+    message = error.get('message') or ''
+    if 'version' in message.lower() or 'outdated' in message.lower():
+        return VersionConflict(message)
+    return RuntimeError(message)
+
+
+class TokenBucket:
+
+    # Allows on average 'rate' calls per second, with bursts of up to 'rate'
+    # calls (at least one)
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(rate, 1)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
 class Server:
 
-    def __init__(self, hostname, username, password):
-        self.confluenceBase = 'https://%s/rpc/json-rpc/confluenceservice-v2' % hostname
+    def __init__(self, hostname, username, password, ledger=None, force=False, rate=None):
+        # hostname may also be a URL, such as http://localhost:8090, for a
+        # server not using HTTPS or on another port
+        if '://' not in hostname:
+            hostname = 'https://' + hostname
+        self.confluenceBase = '%s/rpc/json-rpc/confluenceservice-v2' % hostname.rstrip('/')
+        # Optional Ledger of previously published content. Unless force is
+        # set, pages whose content matches the ledger are not published again.
+        self.ledger = ledger
+        self.force = force
+        # Optional limit on the number of calls per second
+        self.limiter = None
+        if rate:
+            self.limiter = TokenBucket(rate)
+        self.stats = dict(published=0, unchanged=0, reread=0, retried=0)
+        # Known pages, keyed by (space, title), with their id, version and
+        # parent id (version may be None if not known), and the (space,
+        # parent id) pairs whose children have all been loaded
+        self.pages = {}
+        self.listed = set()
+        self.lock = threading.Lock()
 
         self.params = dict(
             auth = HTTPBasicAuth(username, password),
@@ -16,20 +80,118 @@ class Server:
                 }
             )
 
-    def getPageId(self, space, title):
-        response = requests.post(self.confluenceBase + '/getPage',
-            data=json.dumps([space, title]), **self.params)
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def rpc(self, method, *args):
+        if self.limiter is not None:
+            self.limiter.take()
+        response = Transport.post(self.confluenceBase + '/' + method,
+            data=json.dumps(list(args)), endpoint='confluence ' + method, **self.params)
         response.raise_for_status()
-        page = response.json()
+        return response.json()
+
+    def remember(self, page):
+        with self.lock:
+            self.pages[(page['space'], page['title'])] = {
+                'id': page['id'],
+                'version': page.get('version'),
+                'parentId': page.get('parentId')
+            }
+
+    def getPage(self, space, title):
+        page = self.rpc('getPage', space, title)
+        if 'error' not in page:
+            self.remember(page)
+        return page
+
+    def getPageId(self, space, title):
+        with self.lock:
+            cached = self.pages.get((space, title))
+        if cached is not None:
+            return cached['id']
+        page = self.getPage(space, title)
         assert 'id' in page, page.keys()
         pageId = page['id']
         return pageId
 
+    def loadChildren(self, space, title):
+        # Look up a page and all of its children with two calls, so that
+        # publishing the children does not need to look each one up. The
+        # child listing has no versions, so take them from the ledger, if it
+        # was the ledger that last published the page.
+        parentId = self.getPageId(space, title)
+        children = self.rpc('getChildren', parentId)
+        if 'error' in children:
+            raise RuntimeError(children['error']['message'])
+        for child in children:
+            version = None
+            if self.ledger is not None:
+                entry = self.ledger.get(child['space'], child['title'])
+                if entry is not None and entry['id'] == child['id']:
+                    version = entry['version']
+            with self.lock:
+                cached = self.pages.get((child['space'], child['title']))
+                if cached is None or cached['id'] != child['id']:
+                    self.pages[(child['space'], child['title'])] = {
+                        'id': child['id'],
+                        'version': version,
+                        'parentId': child['parentId']
+                    }
+        with self.lock:
+            self.listed.add((space, parentId))
+        return parentId
+
+    def storePage(self, update):
+        newPage = self.rpc('storePage', update)
+        if 'error' not in newPage:
+            assert 'content' in newPage, newPage.keys()
+            self.remember(newPage)
+        return newPage
+
     def publish(self, content, space, title, parentId):
-        response = requests.post(self.confluenceBase + '/getPage',
-            data=json.dumps([space, title]), **self.params)
-        response.raise_for_status()
-        page = response.json()
+        digest = hashlib.sha256(json.dumps([parentId, content]).encode('utf-8')).hexdigest()
+        if self.ledger is not None and not self.force:
+            entry = self.ledger.get(space, title)
+            if entry is not None and entry['hash'] == digest:
+                self.count('unchanged')
+                return
+        with self.lock:
+            cached = self.pages.get((space, title))
+            listed = (space, parentId) in self.listed
+        newPage = None
+        if cached is not None and cached['version'] is not None and cached['parentId'] is not None:
+            # Update using the known id and version. If the page changed
+            # since, fall back to reading it below.
+            newPage = self.storePage({
+                'id': cached['id'],
+                'space': space,
+                'title': title,
+                'content': content,
+                'version': cached['version'],
+                'parentId': cached['parentId']
+            })
+        elif cached is None and listed:
+            # Not among the parent's children, so create it directly. If it
+            # exists elsewhere in the space, fall back to reading it below.
+            newPage = self.storePage({
+                'space': space,
+                'title': title,
+                'content': content,
+                'parentId': parentId
+            })
+        if newPage is not None and 'error' in newPage:
+            self.count('reread')
+            newPage = None
+        if newPage is None:
+            newPage = self.publishPage(content, space, title, parentId)
+        self.count('published')
+        if self.ledger is not None:
+            self.ledger.update(space, title, digest, newPage['id'], newPage['version'])
+
+    def publishPage(self, content, space, title, parentId):
+        page = self.getPage(space, title)
         if 'error' in page:
             code = page['error']['code']
             if code == 500:
@@ -45,12 +207,9 @@ class Server:
                     minorEdit = False
                     )
 
-                response = requests.post(self.confluenceBase + '/storePage',
-                    data=json.dumps([update]), **self.params)
-                response.raise_for_status()
-                newPage = response.json()
+                newPage = self.storePage(update)
                 if 'error' in newPage:
-                    raise RuntimeError(newPage['error']['message'])
+                    raise storeError(newPage['error'])
             else:
                 raise RuntimeError(page['error']['message'])
         else:
@@ -84,12 +243,77 @@ class Server:
             #     minorEdit = False
             #     )
 
-            response = requests.post(self.confluenceBase + '/storePage',
-                data=json.dumps([update]), **self.params)
-            response.raise_for_status()
-
-            newPage = response.json()
+            newPage = self.storePage(update)
             if 'error' in newPage:
-                raise RuntimeError(newPage['error']['message'])
-            assert 'content' in newPage, newPage.keys()
+                raise storeError(newPage['error'])
             # newContent = newPage['content']
+        return newPage
+
+    def resyncLedger(self):
+        # Forget ledger entries for pages that were deleted, or changed by
+        # someone else, since we last published them, so that they will be
+        # published again.
+        dropped = 0
+        for space, title, entry in self.ledger.entries():
+            page = self.getPage(space, title)
+            if 'error' in page or page['id'] != entry['id'] or str(page['version']) != str(entry['version']):
+                self.ledger.drop(space, title)
+                dropped += 1
+        print('Confluence ledger: %d pages changed on the server' % dropped)
+
+    def printStatistics(self):
+        print('Confluence pages: %(published)d published, %(unchanged)d unchanged since last published, %(reread)d re-read after a failed update, %(retried)d retried' % self.stats)
+
+
+def isTransient(exc):
+    if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, VersionConflict)):
+        return True
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response is not None and exc.response.status_code >= 500
+    return False
+
+
+class PublishQueue:
+
+    # Publishes pages concurrently. Transient failures (server errors,
+    # connection problems and version conflicts) are retried, waiting
+    # backoff seconds before the first retry and doubling the wait for each
+    # later retry.
+
+    def __init__(self, server, workers=4, retries=3, backoff=1.0):
+        self.server = server
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = concurrent.futures.ThreadPoolExecutor(max(workers, 1))
+        self.futures = []
+
+    def submit(self, content, space, title, parentId):
+        future = self.executor.submit(Tracing.propagate(self.publish), content, space, title, parentId)
+        self.futures.append((title, future))
+        return future
+
+    def publish(self, content, space, title, parentId):
+        with Tracing.span('publish', title=title):
+            return self.publishWithRetries(content, space, title, parentId)
+
+    def publishWithRetries(self, content, space, title, parentId):
+        attempt = 0
+        while True:
+            try:
+                return self.server.publish(content, space, title, parentId)
+            except Exception as exc:
+                if attempt >= self.retries or not isTransient(exc):
+                    raise
+                self.server.count('retried')
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+
+    def wait(self):
+        # Wait for every submitted page, and raise an error if any failed
+        self.executor.shutdown(wait=True)
+        failures = [(title, future.exception()) for title, future in self.futures
+            if future.exception() is not None]
+        for title, exc in failures:
+            print('Failed to publish %s: %s' % (title, exc))
+        if failures:
+            raise RuntimeError('%d pages failed to publish' % len(failures))
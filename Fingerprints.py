@@ -0,0 +1,53 @@
+import json, os, threading
+
+# Fingerprints of the catalogue data behind each published page, kept
+# between runs so that an incremental run can skip services whose data has
+# not changed. The file holds one section per uploader, mapping each service
+# URL to its fingerprint and the title of its page (None if the service was
+# not published).
+
+
+class Fingerprints:
+
+    def __init__(self, path):
+        self.path = path
+        self.previous = {}
+        if path and os.path.exists(path):
+            with open(path, 'rt', encoding='utf-8') as f:
+                self.previous = json.load(f)
+        # Entries for this run. Only services seen in this run are saved, so
+        # services removed from the catalogue are forgotten.
+        self.current = {}
+        self.lock = threading.Lock()
+
+    def unchanged(self, section, url, fingerprint):
+        entry = self.previous.get(section, {}).get(url)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        with self.lock:
+            self.current.setdefault(section, {})[url] = entry
+        return entry
+
+    def update(self, section, url, fingerprint, page):
+        with self.lock:
+            self.current.setdefault(section, {})[url] = {
+                'fingerprint': fingerprint,
+                'page': page
+            }
+
+    def updateWhenDone(self, future, section, url, fingerprint, page):
+        # Update the entry once a page has been published successfully
+        def done(future):
+            if future.exception() is None:
+                self.update(section, url, fingerprint, page)
+        future.add_done_callback(done)
+
+    def save(self):
+        if not self.path:
+            return
+        fingerprints = dict(self.previous)
+        fingerprints.update(self.current)
+        tmpname = self.path + '.tmp'
+        with open(tmpname, 'wt', encoding='utf-8') as f:
+            json.dump(fingerprints, f, indent=1, sort_keys=True)
+        os.replace(tmpname, self.path)
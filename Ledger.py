@@ -0,0 +1,48 @@
+import json, os, threading
+
+# Record of the content last published to each Confluence page: a hash of
+# the content, with the page id and version stored by Confluence. It allows
+# publishing to be skipped when the rendered content has not changed, without
+# asking Confluence.
+
+
+class Ledger:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pages = {}
+        if path and os.path.exists(path):
+            with open(path, 'rt', encoding='utf-8') as f:
+                self.pages = json.load(f)
+
+    def get(self, space, title):
+        with self.lock:
+            return self.pages.get(space, {}).get(title)
+
+    def update(self, space, title, digest, pageId, version):
+        with self.lock:
+            self.pages.setdefault(space, {})[title] = {
+                'hash': digest,
+                'id': pageId,
+                'version': version
+            }
+
+    def drop(self, space, title):
+        with self.lock:
+            self.pages.get(space, {}).pop(title, None)
+
+    def entries(self):
+        with self.lock:
+            return [(space, title, dict(entry))
+                for space, titles in self.pages.items()
+                for title, entry in titles.items()]
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            tmpname = self.path + '.tmp'
+            with open(tmpname, 'wt', encoding='utf-8') as f:
+                json.dump(self.pages, f, indent=1, sort_keys=True)
+            os.replace(tmpname, self.path)
@@ -0,0 +1,60 @@
+import json, os, threading, time
+
+# Results of checking documentation links, kept between runs so that a link
+# checked recently is not checked again. Working links are trusted for
+# successTTL seconds, and broken links for failureTTL seconds, so that a
+# broken link is reported again, or found to be fixed, sooner.
+
+
+class LinkCache:
+
+    def __init__(self, path, successTTL, failureTTL, recheck=False):
+        # If recheck is set, previous results are ignored, but the results of
+        # this run are still saved
+        self.path = path
+        self.successTTL = successTTL
+        self.failureTTL = failureTTL
+        self.lock = threading.Lock()
+        self.links = {}
+        if path and os.path.exists(path):
+            with open(path, 'rt', encoding='utf-8') as f:
+                self.links = json.load(f)
+        self.recheck = recheck
+
+    def ttl(self, entry):
+        if entry['error'] is not None or entry['status'] >= 400:
+            return self.failureTTL
+        return self.successTTL
+
+    def fresh(self, entry, now):
+        return now - entry['checked'] < self.ttl(entry)
+
+    def get(self, link):
+        # Returns (status, title, error), or None if the link needs checking
+        if self.recheck:
+            return None
+        with self.lock:
+            entry = self.links.get(link)
+        if entry is None or not self.fresh(entry, time.time()):
+            return None
+        return entry['status'], entry['title'], entry['error']
+
+    def put(self, link, status, title, error):
+        with self.lock:
+            self.links[link] = {
+                'status': status,
+                'title': title,
+                'error': error,
+                'checked': time.time()
+            }
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        with self.lock:
+            links = {link: entry for link, entry in self.links.items() if self.fresh(entry, now)}
+            tmpname = self.path + '.tmp'
+            with open(tmpname, 'wt', encoding='utf-8') as f:
+                json.dump(links, f, indent=1, sort_keys=True)
+            os.replace(tmpname, self.path)
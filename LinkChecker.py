@@ -0,0 +1,240 @@
+import collections, concurrent.futures, re, threading, urllib.parse
+import requests
+
+import Metrics, Tracing, Transport
+from ServiceCatalographer import NotInSnapshot
+
+# Outcome of checking a documentation link. 'error' is None if the server
+# responded, 'connection' if it did not respond, or 'invalid' if the link is
+# not a URL. 'title' is the HTML title of the page, if it has one.
+LinkResult = collections.namedtuple('LinkResult', 'status title error')
+
+titleRE = re.compile('<title>([^<]+)</title>', re.IGNORECASE)
+
+# Links to these kinds of file are checked with a HEAD request, as they will
+# not have an HTML title
+binaryExtensions = ('.pdf', '.zip', '.gz', '.tgz', '.tar', '.jar', '.doc', '.docx',
+    '.xls', '.xlsx', '.ppt', '.pptx', '.png', '.jpg', '.jpeg', '.gif', '.mp4')
+
+
+def documentationLinks(service):
+    # The documentation links that the reporters show for a service
+    links = list(service.summary().service.summary.documentation_urls or [])
+    for variant in service.variants:
+        resource = variant.resource()
+        if hasattr(resource, 'soap_service'):
+            interface = resource.soap_service
+        else:
+            interface = resource.rest_service
+        if interface.documentation_url is not None:
+            links.append(interface.documentation_url)
+    return links
+
+
+class LinkChecker:
+
+    # Checks documentation links, remembering the result for each link so
+    # that a link shared by several services or variants is only fetched once
+    # per run.
+
+    def __init__(self, results=None, offline=False, recorder=None,
+            workers=8, hostConnections=2, timeout=10, titleBytes=65536, cache=None):
+        # Results may be preloaded, e.g. from a snapshot. When offline, links
+        # without a preloaded result are not fetched. A recorder receives
+        # every new result, to save them as a snapshot. An optional LinkCache
+        # provides results from previous runs, and keeps the new results.
+        #
+        # checkAll checks links using up to 'workers' threads, but with no
+        # more than hostConnections requests to any one host at a time.
+        # Requests give up after 'timeout' seconds. No more than titleBytes
+        # of a page are read when looking for its title.
+        self.results = dict(results or {})
+        self.offline = offline
+        self.recorder = recorder
+        self.workers = workers
+        self.hostConnections = hostConnections
+        self.timeout = timeout
+        self.titleBytes = titleBytes
+        self.cache = cache
+        self.hosts = {}
+        self.lock = threading.Lock()
+        self.stats = dict(checked=0, cached=0, repeated=0, head=0, bytes=0)
+        # Bytes of the page read for each link fetched with GET
+        self.pageBytes = {}
+
+    def checkAll(self, links, referrers=None):
+        # Check links concurrently, ahead of the reporters asking for them.
+        # referrers optionally maps each link to the services that show it,
+        # so that tracing can attribute the time spent on it.
+        referrers = referrers or {}
+        with self.lock:
+            links = [link for link in collections.OrderedDict.fromkeys(links)
+                if link not in self.results]
+        if self.offline:
+            return
+        links = [link for link in links if not self.fromCache(link)]
+        if not links:
+            return
+        # Each host has its own queue, and a link is only handed to a worker
+        # when its host has a connection free, so no worker waits on a slow
+        # host while links to other hosts are queued. Hosts take turns.
+        queues = collections.OrderedDict()
+        for link in links:
+            queues.setdefault(host(link), collections.deque()).append(link)
+        active = dict.fromkeys(queues, 0)
+        fetch = Tracing.propagate(self.fetch)
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(min(self.workers, len(links))) as executor:
+            while queues or running:
+                started = True
+                while started and len(running) < self.workers:
+                    started = False
+                    for name in list(queues):
+                        if len(running) >= self.workers:
+                            break
+                        if active[name] < self.hostConnections:
+                            link = queues[name].popleft()
+                            if not queues[name]:
+                                del queues[name]
+                            running[executor.submit(fetch, link, referrers.get(link))] = link
+                            active[name] += 1
+                            started = True
+                done, notDone = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    link = running.pop(future)
+                    active[host(link)] -= 1
+                    self.store(link, future.result())
+
+    def hostLimit(self, link):
+        # For links checked one at a time, outside checkAll
+        name = host(link)
+        with self.lock:
+            semaphore = self.hosts.get(name)
+            if semaphore is None:
+                semaphore = self.hosts[name] = threading.BoundedSemaphore(self.hostConnections)
+        return semaphore
+
+    def check(self, link):
+        with self.lock:
+            result = self.results.get(link)
+            if result is not None:
+                self.stats['repeated'] += 1
+                return result
+        if self.offline:
+            raise NotInSnapshot(link)
+        result = self.fromCache(link)
+        if result is None:
+            with self.hostLimit(link):
+                result = self.fetch(link)
+            self.store(link, result)
+        return result
+
+    def fromCache(self, link):
+        if self.cache is None:
+            return None
+        cached = self.cache.get(link)
+        if cached is None:
+            return None
+        result = LinkResult(*cached)
+        self.store(link, result, 'cached')
+        return result
+
+    def store(self, link, result, source='checked'):
+        if self.recorder is not None:
+            self.recorder.link(link, result)
+        if self.cache is not None and source == 'checked':
+            self.cache.put(link, *result)
+        with self.lock:
+            self.results[link] = result
+            self.stats[source] += 1
+
+    def fetch(self, link, services=None):
+        args = {'link': link}
+        if services:
+            args['services'] = services
+        with Tracing.span('link', **args):
+            return self.fetchLink(link)
+
+    def fetchLink(self, link):
+        try:
+            if urllib.parse.urlsplit(link).path.lower().endswith(binaryExtensions):
+                result = self.head(link)
+                if result is not None:
+                    return result
+            return self.get(link)
+        except (requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema,
+                requests.exceptions.InvalidURL, ValueError):
+            return LinkResult(None, None, 'invalid')
+        except requests.exceptions.RequestException:
+            return LinkResult(None, None, 'connection')
+
+    def head(self, link):
+        # Only the status is needed, unless the server says the link is HTML
+        # after all. Some servers refuse HEAD requests, so a failure is
+        # checked again using GET.
+        response = Transport.head(link, verify = False, timeout = self.timeout, allow_redirects = True,
+            endpoint = 'documentation links')
+        self.count('head')
+        if response.status_code >= 400 or isHTML(response):
+            return None
+        return LinkResult(response.status_code, None, None)
+
+    def get(self, link):
+        # Read the page only as far as the end of its title
+        with Transport.get(link, verify = False, timeout = self.timeout, stream = True,
+                endpoint = 'documentation links') as response:
+            status_code = response.status_code
+            title = None
+            if status_code < 400 and isHTML(response):
+                body = bytearray()
+                for chunk in response.iter_content(8192):
+                    start = max(len(body) - 7, 0)
+                    body += chunk
+                    if b'</title>' in body[start:].lower() or len(body) >= self.titleBytes:
+                        break
+                # Count everything read, including the end of the last chunk,
+                # which is not searched for the title
+                with self.lock:
+                    self.stats['bytes'] += len(body)
+                    self.pageBytes[link] = len(body)
+                Metrics.metrics.addBytes('documentation links', len(body))
+                del body[self.titleBytes:]
+                m = titleRE.search(decode(body, response.encoding))
+                if m:
+                    title = m.group(1).strip().replace('\n', ' ') or None
+        return LinkResult(status_code, title, None)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+
+    def printStatistics(self, count=5):
+        print('Documentation links: %(checked)d checked, %(cached)d checked recently, %(repeated)d repeated checks avoided, %(head)d HEAD requests, %(bytes)d bytes of pages read' % self.stats)
+        with self.lock:
+            largest = sorted(self.pageBytes.items(), key=lambda item: -item[1])[:count]
+        if largest:
+            print('Most bytes read for a documentation link:')
+            for link, size in largest:
+                print('%10d  %s' % (size, link))
+
+
+def host(link):
+    try:
+        return urllib.parse.urlsplit(link).netloc
+    except ValueError:
+        # Not a valid URL; fetching it will say so
+        return ''
+
+
+def decode(body, encoding):
+    # Pages may declare a charset that Python does not know
+    try:
+        return body.decode(encoding or 'utf-8', 'replace')
+    except LookupError:
+        return body.decode('utf-8', 'replace')
+
+
+def isHTML(response):
+    # Pages without a Content-Type are assumed to be HTML
+    contentType = response.headers.get('Content-Type', 'text/html').lower()
+    return 'html' in contentType
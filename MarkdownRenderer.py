@@ -0,0 +1,54 @@
+import hashlib, json, os, threading
+import markdown
+
+# Converts service descriptions and contacts from Markdown to HTML. One
+# converter is reused for every text, as creating a converter loads its
+# extensions, and each distinct text is converted only once. The HTML can be
+# kept in a file between runs; it is discarded if the Markdown library
+# version changes, and only the texts used by the latest run are kept.
+
+
+class MarkdownRenderer:
+
+    def __init__(self, path=None):
+        self.path = path
+        self.converter = markdown.Markdown(extensions = ['extra'], output_format = 'xhtml1',
+            safe_mode = 'escape')
+        self.lock = threading.Lock()
+        self.html = {}
+        # Keys of the texts converted or reused by this run
+        self.used = set()
+        if path and os.path.exists(path):
+            with open(path, 'rt', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('version') == markdown.__version__:
+                self.html = saved['html']
+        self.stats = dict(converted=0, reused=0)
+
+    def convert(self, text):
+        key = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        with self.lock:
+            self.used.add(key)
+            html = self.html.get(key)
+            if html is not None:
+                self.stats['reused'] += 1
+                return html
+            html = self.converter.reset().convert(text)
+            self.html[key] = html
+            self.stats['converted'] += 1
+        return html
+
+    def save(self):
+        # A run that used no texts, e.g. one rendering in worker processes
+        # with their own renderers, leaves the file as it was
+        if not self.path or not self.used:
+            return
+        with self.lock:
+            html = {key: self.html[key] for key in self.used}
+            tmpname = self.path + '.tmp'
+            with open(tmpname, 'wt', encoding='utf-8') as f:
+                json.dump({'version': markdown.__version__, 'html': html}, f, indent=1, sort_keys=True)
+            os.replace(tmpname, self.path)
+
+    def printStatistics(self):
+        print('Markdown texts: %(converted)d converted, %(reused)d conversions avoided' % self.stats)
@@ -0,0 +1,191 @@
+import html, re
+
+from Rendering import htmlAttr, htmlText
+
+# The maturity evaluation of a service, without rendering any pages: the
+# problems preventing evaluation, the actions needed to obtain each maturity
+# level, and other issues that do not affect the level. ServiceReporter
+# evaluates with the full set of checks, and PublicServiceReporter with
+# public=True, which leaves out the checks that do not apply to the public
+# pages. The actions are HTML, as shown on the pages.
+
+
+class Evaluation:
+
+    def __init__(self):
+        # level[0] holds the problems that prevent the service being
+        # evaluated, and level[n] the actions needed to obtain level n
+        self.level = ([], [], [], [])
+        self.other = []
+
+    def maturity(self):
+        # The provisional maturity level, or None if the service has problems
+        # that prevent it being evaluated
+        if self.level[0]:
+            return None
+        for target in (1, 2, 3):
+            if self.level[target]:
+                return target - 1
+        return 3
+
+    def toJSON(self):
+        return {
+            'maturity': self.maturity(),
+            'problems': [plainText(item) for item in self.level[0]],
+            'actions': {str(target): [plainText(item) for item in self.level[target]] for target in (1, 2, 3)},
+            'other': [plainText(item) for item in self.other]
+        }
+
+
+def plainText(fragment):
+    return html.unescape(re.sub(r'<[^>]*>', '', fragment))
+
+
+def isLongWikiLink(link):
+    return ((link.startswith('http://wiki.biovel.eu') or link.startswith('https://wiki.biovel.eu'))
+        and not (link.startswith('http://wiki.biovel.eu/x/') or link.startswith('https://wiki.biovel.eu/x/')))
+
+
+def linkAction(link, links, public=False):
+    # The action needed to fix a documentation link, if any
+    result = links.check(link)
+    anchor = '<a href="%s"><code>%s</code></a>' % (htmlAttr(link), htmlText(link))
+    if result.error == 'connection':
+        return 'Check documentation link: %s' % anchor
+    elif result.error == 'invalid':
+        return 'Remove text from documentation links'
+    elif public:
+        return None
+    elif result.status >= 400:
+        return 'Check documentation link: %s' % anchor
+    elif isLongWikiLink(link):
+        return 'Change BioVeL Wiki long link to tiny link (using Wiki menu Tools -> Link to this page...)'
+    return None
+
+
+def publicDescriptions(service, summary):
+    # The descriptions shown on the public page: the service description
+    # followed by the summary descriptions, without repeating the first
+    descriptions = list(summary.descriptions or [])
+    if service.description:
+        descriptions.insert(0, service.description)
+    if len(descriptions) > 1 and descriptions[0] == descriptions[1]:
+        del descriptions[0]
+    return descriptions
+
+
+def publicCategories(summary):
+    # All services on the public pages are BioVeL services, so the category
+    # is not shown
+    categories = [category.name for category in summary.categories]
+    if 'BioVeL' in categories:
+        categories.remove('BioVeL')
+    return categories
+
+
+def descriptionAction(service, summary, public=False):
+    # The action needed to describe the service, if any
+    if public:
+        descriptions = publicDescriptions(service, summary)
+        if not descriptions:
+            return 'Add service description'
+    else:
+        descriptions = summary.descriptions
+        if descriptions is None:
+            return 'Add service description'
+    if len(descriptions) == 1 and descriptions[0] == service.name:
+        return 'Improve service description'
+    return None
+
+
+def hasCategory(summary, public=False):
+    if public:
+        return bool(publicCategories(summary))
+    return bool(summary.categories)
+
+
+def hasWSDL(interface):
+    return interface.wsdl_location is not None
+
+
+def isDescribed(item, soap=False):
+    # Whether an operation or parameter has a description. The catalogue
+    # gives SOAP items without a description a null one, and REST items an
+    # empty one.
+    if soap:
+        return item.description is not None
+    return bool(item.description)
+
+
+def evaluate(service, links, public=False):
+    # The checks are made in the order the reporters show the information,
+    # so the actions are listed in the same order
+    evaluation = Evaluation()
+    level = evaluation.level
+    summary = service.summary().service.summary
+
+    # The public pages show the description before the categories
+    if not public and not hasCategory(summary):
+        level[2].append('Add service to a category')
+    action = descriptionAction(service, summary, public)
+    if action:
+        level[1].append(action)
+    if public and not hasCategory(summary, public):
+        level[2].append('Add service to a category')
+
+    documentation_urls = summary.documentation_urls
+    if documentation_urls:
+        for url in documentation_urls:
+            action = linkAction(url, links, public)
+            if action:
+                evaluation.other.append(action)
+    else:
+        level[1].append('Add documentation link')
+
+    if not public and not summary.licenses:
+        level[2].append('Add license details')
+
+    if not summary.contacts:
+        level[1].append('Add contact')
+
+    for variant in service.variants:
+        resource = variant.resource()
+        if hasattr(resource, 'soap_service'):
+            soapInterface(level, variant, resource.soap_service)
+        else:
+            restInterface(level, variant, resource.rest_service)
+    return evaluation
+
+
+def soapInterface(level, variant, interface):
+    name = '%s (SOAP)' % variant.name
+    if not hasWSDL(interface):
+        level[2].append('Add link to WSDL document')
+    if not interface.operations:
+        level[2].append('Add description of available operations for variant %s' % name)
+    for operation in interface.operations:
+        soap_operation = operation.resource().soap_operation
+        for kind, parameters in (('input', soap_operation.inputs), ('output', soap_operation.outputs)):
+            for parameter in parameters or []:
+                if not isDescribed(parameter, soap=True):
+                    parameterAction(level, soap_operation.name, kind, parameter)
+
+
+def restInterface(level, variant, interface):
+    name = '%s (REST)' % variant.name
+    if not interface.resources:
+        level[2].append('Add description of available operations for variant %s' % name)
+    for operation in interface.resources:
+        for method in operation.resource().rest_resource.methods:
+            if not isDescribed(method):
+                level[2].append('Add description to operation "%s"' % htmlText(method.endpoint_label))
+            rest_method = method.resource().rest_method
+            for kind, parameters in (('input', rest_method.inputs.parameters), ('output', rest_method.outputs.parameters)):
+                for parameter in parameters or []:
+                    if not isDescribed(parameter):
+                        parameterAction(level, method.endpoint_label, kind, parameter)
+
+
+def parameterAction(level, operationName, kind, parameter):
+    # kind is 'input' or 'output'
+    level[3].append('Add description to operation "%s" %s "%s"' % (htmlText(operationName), kind, htmlText(parameter.name)))
@@ -0,0 +1,51 @@
+import json, os, sys
+
+import MaturityEvaluator, Runner, Tracing
+
+# Writes the maturity evaluation of every service in the catalogue to a file,
+# as one JSON object per line:
+#
+#   {"service": "<URL>", "id": "32", "name": "...",
+#    "evaluation": {"maturity": 1, "problems": [], "actions": {"1": [], "2": [...], "3": [...]}, "other": [...]},
+#    "publicEvaluation": {...}}
+#
+# "evaluation" uses the checks of the service evaluation pages, and
+# "publicEvaluation" those of the public service pages. "maturity" is null
+# if there are problems preventing evaluation. No pages are rendered and
+# nothing is sent to Confluence.
+
+def export(path, run=None):
+    with Runner.session(run) as run:
+        bdc = run.catalogue
+        services = run.services()
+        for service in services:
+            with Tracing.service(service.self), Tracing.span('fetch'):
+                bdc.prefetch(service)
+        run.checkLinks(services)
+        maturity = {}
+        tmpname = path + '.tmp'
+        with open(tmpname, 'wt', encoding='utf-8') as f:
+            for service in services:
+                with Tracing.service(service.self), Tracing.span('evaluate'):
+                    evaluation = MaturityEvaluator.evaluate(service, run.links)
+                    publicEvaluation = MaturityEvaluator.evaluate(service, run.links, public=True)
+                record = {
+                    'service': service.self,
+                    'id': service.self.split('/')[-1],
+                    'name': service.name,
+                    'evaluation': evaluation.toJSON(),
+                    'publicEvaluation': publicEvaluation.toJSON()
+                }
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+                level = evaluation.maturity()
+                maturity[level] = maturity.get(level, 0) + 1
+        os.replace(tmpname, path)
+        print('Service evaluations: %d written to %s' % (len(services), path))
+        if maturity:
+            print('Maturity of services: %s' % ', '.join('level %s: %d' % (level, count)
+                for level, count in sorted(maturity.items(), key=lambda item: (item[0] is None, item[0]))))
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit('usage: python3 MaturityExport.py FILE')
+    export(sys.argv[1])
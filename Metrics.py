@@ -0,0 +1,142 @@
+import json, math, os, threading, urllib.parse
+
+# Counts, latencies, response sizes and status codes of the HTTP requests
+# made during a run, per endpoint. Every request goes through Transport,
+# which records it here. Callers name the endpoint where the URL alone does
+# not say what the request is for (documentation links, Confluence calls);
+# otherwise the endpoint is the URL path with the parts holding ids
+# (anything with a digit) replaced by '*', e.g. 'services/*/summary'.
+
+# Upper bounds, in seconds, of the latency histogram buckets
+buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+
+def classify(url):
+    path = urllib.parse.urlsplit(url).path.strip('/')
+    return '/'.join(['*' if any(c.isdigit() for c in segment) else segment
+        for segment in path.split('/')]) or '/'
+
+
+class Endpoint:
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.maxSeconds = 0.0
+        self.bytes = 0
+        self.statuses = {}
+        self.histogram = [0] * len(buckets)
+
+    def record(self, seconds, status, size):
+        self.count += 1
+        self.seconds += seconds
+        self.maxSeconds = max(self.maxSeconds, seconds)
+        self.bytes += size
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        for i, bound in enumerate(buckets):
+            if seconds <= bound:
+                self.histogram[i] += 1
+                break
+
+    def errors(self):
+        # Requests that failed, or got an error status
+        return sum(count for status, count in self.statuses.items()
+            if status == 'error' or status >= 400)
+
+    def percentile(self, fraction):
+        # The upper bound of the bucket holding the given fraction of
+        # requests (so an overestimate)
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(buckets, self.histogram):
+            seen += count
+            if seen >= target:
+                return min(bound, self.maxSeconds)
+        return self.maxSeconds
+
+
+class Metrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def endpoint(self, name):
+        endpoint = self.endpoints.get(name)
+        if endpoint is None:
+            endpoint = self.endpoints[name] = Endpoint()
+        return endpoint
+
+    def record(self, name, seconds, status, size):
+        # status is the HTTP status code, or 'error' if there was no response
+        with self.lock:
+            self.endpoint(name).record(seconds, status, size)
+
+    def addBytes(self, name, size):
+        # For responses whose body is read after they are recorded
+        with self.lock:
+            self.endpoint(name).bytes += size
+
+    def printTable(self):
+        with self.lock:
+            endpoints = sorted(self.endpoints.items(), key=lambda item: -item[1].seconds)
+            print('%-40s %8s %6s %9s %9s %9s %9s %12s' % ('HTTP endpoint', 'requests', 'errors',
+                'total s', 'mean ms', 'p95 ms', 'max ms', 'bytes'))
+            for name, endpoint in endpoints:
+                print('%-40s %8d %6d %9.2f %9.1f %9.1f %9.1f %12d' % (name, endpoint.count, endpoint.errors(),
+                    endpoint.seconds, 1000 * endpoint.seconds / endpoint.count,
+                    1000 * endpoint.percentile(0.95), 1000 * endpoint.maxSeconds, endpoint.bytes))
+
+    def toJSON(self):
+        with self.lock:
+            return {name: {
+                'requests': endpoint.count,
+                'seconds': endpoint.seconds,
+                'maxSeconds': endpoint.maxSeconds,
+                'bytes': endpoint.bytes,
+                'statuses': {str(status): count for status, count in endpoint.statuses.items()},
+                'histogram': {str(bound): count for bound, count in zip(buckets, endpoint.histogram)}
+            } for name, endpoint in self.endpoints.items()}
+
+    def toPrometheus(self):
+        # Text exposition format, e.g. for the node exporter textfile collector
+        lines = []
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            lines.append('# HELP katoomba_http_requests_total HTTP requests made by the last run.')
+            lines.append('# TYPE katoomba_http_requests_total counter')
+            for name, endpoint in endpoints:
+                for status, count in sorted(endpoint.statuses.items(), key=lambda item: str(item[0])):
+                    lines.append('katoomba_http_requests_total{endpoint="%s",status="%s"} %d' % (label(name), status, count))
+            lines.append('# HELP katoomba_http_response_bytes_total Bytes of HTTP responses read by the last run.')
+            lines.append('# TYPE katoomba_http_response_bytes_total counter')
+            for name, endpoint in endpoints:
+                lines.append('katoomba_http_response_bytes_total{endpoint="%s"} %d' % (label(name), endpoint.bytes))
+            lines.append('# HELP katoomba_http_request_duration_seconds Latency of HTTP requests made by the last run.')
+            lines.append('# TYPE katoomba_http_request_duration_seconds histogram')
+            for name, endpoint in endpoints:
+                seen = 0
+                for bound, count in zip(buckets, endpoint.histogram):
+                    seen += count
+                    le = '+Inf' if bound == math.inf else repr(bound)
+                    lines.append('katoomba_http_request_duration_seconds_bucket{endpoint="%s",le="%s"} %d' % (label(name), le, seen))
+                lines.append('katoomba_http_request_duration_seconds_sum{endpoint="%s"} %f' % (label(name), endpoint.seconds))
+                lines.append('katoomba_http_request_duration_seconds_count{endpoint="%s"} %d' % (label(name), endpoint.count))
+        return '\n'.join(lines) + '\n'
+
+    def save(self, jsonPath=None, prometheusPath=None):
+        for path, text in ((jsonPath, lambda: json.dumps(self.toJSON(), indent=1, sort_keys=True)),
+                (prometheusPath, self.toPrometheus)):
+            if path:
+                tmpname = path + '.tmp'
+                with open(tmpname, 'wt', encoding='utf-8') as f:
+                    f.write(text())
+                os.replace(tmpname, path)
+
+
+def label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+# Requests made by this process
+metrics = Metrics()
@@ -1,5 +1,4 @@
-import Confluence, ServiceCatalographer, PublicServiceReporter
-from config import confluenceHost, confluenceUser, confluencePass, serviceCatalographerURL
+import PublicServiceReporter, Runner, Tracing
 
 # The Wiki space and top-level page to index each service
 # This page will be completely overwritten by the script!
@@ -7,64 +6,89 @@ confluenceSpaceKey = 'doc'
 confluenceParentTitle = 'Supported Services'
 updateServicePages = True # setting to False will only update index page
 
-def upload():
-    confluence = Confluence.Server(confluenceHost, confluenceUser, confluencePass)
-    pageNameMap = {
-        # Any services that are not in BiodiversityCatalogue can be placed here.
-        # 'Service Name': 'Wiki Page Title'
-        'Rserve': 'Rserve service',
-        'WebDAV': 'WebDav_FileSharingService'
-    }
-    parentId = confluence.getPageId(confluenceSpaceKey, confluenceParentTitle)
-    bdc = ServiceCatalographer.ServiceCatalographer(serviceCatalographerURL)
-    services = bdc.getServices()
-    for service in services:
-        serviceId = service.self.split('/')[-1]
-        try:
-            if updateServicePages:
-                content = PublicServiceReporter.report(service)
-        except PublicServiceReporter.DoNotInclude:
-            pass
+def upload(run=None):
+    with Runner.session(run) as run:
+        confluence = run.confluence
+        pageNameMap = {
+            # Any services that are not in BiodiversityCatalogue can be placed here.
+            # 'Service Name': 'Wiki Page Title'
+            'Rserve': 'Rserve service',
+            'WebDAV': 'WebDav_FileSharingService'
+        }
+        parentId = confluence.loadChildren(confluenceSpaceKey, confluenceParentTitle)
+        queue = run.publishQueue()
+        bdc = run.catalogue
+        services = run.services()
+        stale = []
+        for service in services:
+            with Tracing.service(service.self), Tracing.span('fetch'):
+                fingerprint = bdc.fingerprint(service)
+            if run.incremental:
+                previous = run.fingerprints.unchanged('PublicServiceUploader', service.self, fingerprint)
+                if previous is not None:
+                    if previous['page'] is not None:
+                        pageNameMap[service.name] = previous['page']
+                    continue
+            stale.append((service, fingerprint))
+        skipped = len(services) - len(stale)
+        if updateServicePages:
+            run.checkLinks(service for service, fingerprint in stale)
+            rendered = run.renderPool().map(PublicServiceReporter, [service for service, fingerprint in stale])
+        rebuilt = excluded = 0
+        for i, (service, fingerprint) in enumerate(stale):
+            try:
+                if updateServicePages:
+                    content, level = rendered[i].result()
+            except PublicServiceReporter.DoNotInclude:
+                excluded += 1
+                run.fingerprints.update('PublicServiceUploader', service.self, fingerprint, None)
+            else:
+                pageName = 'BioVeL Service - %s' % service.name
+                print('Publishing %s' % pageName)
+                if updateServicePages:
+                    with Tracing.service(service.self):
+                        future = queue.submit(content, confluenceSpaceKey, pageName, parentId)
+                    rebuilt += 1
+                    run.fingerprints.updateWhenDone(future, 'PublicServiceUploader', service.self, fingerprint, pageName)
+                pageNameMap[service.name] = pageName
+        # The index page links to the service pages, so only publish it once
+        # they have all been published
+        queue.wait()
+        print('Public service pages: %d rebuilt, %d not included, %d unchanged and skipped' % (rebuilt, excluded, skipped))
+        content = '<ac:layout>'
+        ncols = 3
+        assert ncols in (2,3), ncols
+        if ncols == 2:
+            content += '<ac:layout-section ac:type="two_equal">\n'
         else:
-            pageName = 'BioVeL Service - %s' % service.name
-            print('Publishing %s' % pageName)
-            if updateServicePages:
-                confluence.publish(content, confluenceSpaceKey, pageName, parentId)
-            pageNameMap[service.name] = pageName
-    content = '<ac:layout>'
-    ncols = 3
-    assert ncols in (2,3), ncols
-    if ncols == 2:
-        content += '<ac:layout-section ac:type="two_equal">\n'
-    else:
-        content += '<ac:layout-section ac:type="three_equal">\n'
-    sortedKeys = sorted(pageNameMap, key=str.lower)
-    split = (len(pageNameMap) + ncols - 1) // ncols
-    for i in range(0, len(sortedKeys), split):
-        subKeys = sortedKeys[i:i+split]
-        content += '<ac:layout-cell>'
-        for serviceName in subKeys:
-            serviceLink = '''<p><b>
+            content += '<ac:layout-section ac:type="three_equal">\n'
+        sortedKeys = sorted(pageNameMap, key=str.lower)
+        split = (len(pageNameMap) + ncols - 1) // ncols
+        for i in range(0, len(sortedKeys), split):
+            subKeys = sortedKeys[i:i+split]
+            content += '<ac:layout-cell>'
+            for serviceName in subKeys:
+                serviceLink = '''<p><b>
       <ac:link>
         <ri:page ri:content-title="%s" />
           <ac:plain-text-link-body><![CDATA[%s]]></ac:plain-text-link-body>
       </ac:link>
     </b></p>''' % (pageNameMap[serviceName], serviceName)
-            content += PublicServiceReporter.panel(serviceLink, bgColor='#f3ffac')
-        content += '</ac:layout-cell>\n'
-    content += '</ac:layout-section>\n'
-    content += '''<ac:layout-section ac:type="single">
+                content += PublicServiceReporter.panel(serviceLink, bgColor='#f3ffac')
+            content += '</ac:layout-cell>\n'
+        content += '</ac:layout-section>\n'
+        content += '''<ac:layout-section ac:type="single">
     <ac:layout-cell>
     <p>To find additional services, search in <ac:structured-macro ac:name="biodivcat"></ac:structured-macro>.</p>
     </ac:layout-cell>
     </ac:layout-section>
 '''
-    content += '</ac:layout>\n'
+        content += '</ac:layout>\n'
 
-    print('Publishing %s' % confluenceParentTitle)
-    # Confluence detects if this page is identical to the previous version, and
-    # does not create a new revision.
-    confluence.publish(content, confluenceSpaceKey, confluenceParentTitle, confluence.getPageId(confluenceSpaceKey, 'BioVeL Wiki'))
+        print('Publishing %s' % confluenceParentTitle)
+        # Confluence detects if this page is identical to the previous version, and
+        # does not create a new revision.
+        confluence.publish(content, confluenceSpaceKey, confluenceParentTitle, confluence.getPageId(confluenceSpaceKey, 'BioVeL Wiki'))
 
 if __name__ == '__main__':
     upload()
\ No newline at end of file
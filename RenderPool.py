@@ -0,0 +1,79 @@
+import concurrent.futures, multiprocessing
+
+import PublicServiceReporter, ServiceReporter, Tracing
+from LinkChecker import LinkChecker, documentationLinks
+from ServiceCatalographer import ServiceCatalographer
+
+# Renders service pages, either in this process or, with more than one
+# worker, in a pool of worker processes so that rendering can use several
+# cores. A worker is not sent the service itself, which is bound to this
+# process's ServiceCatalographer, but the catalogue responses and link
+# results needed to render it, from which it rebuilds the service offline.
+
+reporters = {reporter.__name__: reporter for reporter in (ServiceReporter, PublicServiceReporter)}
+
+
+def renderOffline(reporterName, catalogueURL, serviceURL, bodies, linkResults):
+    # Runs in a worker process. Markdown is converted by the reporter's
+    # default MarkdownRenderer, so is remembered per worker.
+    bdc = ServiceCatalographer(catalogueURL, offline=bodies)
+    service = bdc.getService(serviceURL)
+    return reporters[reporterName].render(service, LinkChecker(linkResults, offline=True))
+
+
+def traced(future, reporterName, serviceURL):
+    # A future for the result of a worker future, recording the time the
+    # worker spent rendering as a span
+    result = concurrent.futures.Future()
+    def done(future):
+        try:
+            page, (start, seconds, pid) = future.result()
+        except Exception as exc:
+            result.set_exception(exc)
+            return
+        if Tracing.tracer.enabled:
+            Tracing.tracer.record('render', start, seconds,
+                {'service': serviceURL, 'reporter': reporterName}, pid=pid, tid=pid)
+        result.set_result(page)
+    future.add_done_callback(done)
+    return result
+
+
+class RenderPool:
+
+    def __init__(self, catalogue, links, renderer, workers=1):
+        self.catalogue = catalogue
+        self.links = links
+        self.renderer = renderer
+        self.executor = None
+        if workers > 1:
+            # Workers are started fresh rather than forked, as this process
+            # has threads (and their locks) that a fork would copy
+            self.executor = concurrent.futures.ProcessPoolExecutor(workers,
+                mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, reporter, service):
+        # Returns a future for the page and maturity level of a service
+        if self.executor is None:
+            future = concurrent.futures.Future()
+            try:
+                with Tracing.service(service.self), Tracing.span('render', reporter=reporter.__name__):
+                    future.set_result(reporter.render(service, self.links, self.renderer))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+        bodies = self.catalogue.subtree(service)
+        # Links under the catalogue URL are CacheResources, which would take
+        # the whole catalogue with them
+        linkResults = {str(link): self.links.check(link) for link in documentationLinks(service)}
+        future = self.executor.submit(Tracing.timed, renderOffline, reporter.__name__, self.catalogue.url,
+            service.self, bodies, linkResults)
+        return traced(future, reporter.__name__, service.self)
+
+    def map(self, reporter, services):
+        # Futures for each of the services, in the same order
+        return [self.submit(reporter, service) for service in services]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
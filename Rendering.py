@@ -0,0 +1,196 @@
+import html
+
+# Parts of the service pages common to both reporters. A page is written to
+# an HtmlWriter, which collects the fragments in a list and joins them once
+# at the end, rather than copying the whole page each time a fragment is
+# added.
+
+descriptionAttribute = 'http://biodiversitycatalogue.org/attribute/description'
+exampleAttribute = 'http://biodiversitycatalogue.org/attribute/exampledata'
+
+
+def htmlText(text):
+    return html.escape(text, quote=False).encode('ascii', 'xmlcharrefreplace').decode('ascii').replace('\n', '<br />')
+
+def htmlAttr(value):
+    return html.escape(str(value))
+
+def alert(text, color):
+    return '<span style="color: %s;">%s</span>' % (color, htmlText(text))
+
+
+class HtmlWriter:
+
+    def __init__(self, alertColor):
+        # alertColor is the colour used to highlight missing information
+        self.alertColor = alertColor
+        self.parts = []
+        self.write = self.parts.append
+
+    def alert(self, text):
+        return alert(text, self.alertColor)
+
+    def check(self, text, err):
+        if text is None:
+            return self.alert(err)
+        return htmlText(text)
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+
+class Variant:
+
+    def __init__(self, description):
+        self.description = description
+        self.deployments = []
+
+
+def variantsTable(w, service, deploymentCell, head, foot):
+    # A table of the service variants, each with its deployments. A
+    # deployment of a variant that the service does not list is shown as an
+    # unknown variant.
+    variants = {}
+    for variant in service.variants:
+        name = variant.name
+        if hasattr(variant.resource(), 'soap_service'):
+            name += ' (SOAP)'
+        else:
+            assert hasattr(variant.resource(), 'rest_service'), variant.resource
+            name += ' (REST)'
+        variants[variant.resource] = Variant('<a href="%s">%s</a>' % (htmlAttr(service.self + '/service_endpoint'), htmlText(name)))
+    for deployment in service.deployments:
+        provided_variant = deployment.resource().service_deployment.provided_variant
+        variant = variants.get(provided_variant.resource)
+        if variant is None:
+            variant = variants[provided_variant.resource] = Variant('<a href="%s">%s</a> %s' % (htmlAttr(provided_variant.resource), htmlText(provided_variant.description), w.alert('(Unknown variant)')))
+        variant.deployments.append(deploymentCell(w, deployment))
+    w.write(head)
+    for variant in variants.values():
+        deployments = variant.deployments or [w.alert('No deployments for this variant')]
+        if len(deployments) == 1:
+            attr = ''
+        else:
+            attr = ' rowspan="%d"' % len(deployments)
+        w.write('<tr><td%s>%s</td>\n' % (attr, variant.description))
+        w.write('<tr>'.join(['<td>%s</td></tr>\n' % deployment for deployment in deployments]))
+    w.write(foot)
+
+
+def interfaces(w, service, links, massageLink):
+    # A section for each variant, describing its operations
+    for variant in service.variants:
+        resource = variant.resource()
+        if hasattr(resource, 'soap_service'):
+            soapInterface(w, variant, resource.soap_service, links, massageLink)
+        else:
+            restInterface(w, variant, resource.rest_service, links, massageLink)
+
+
+def documentation(w, interface, links, massageLink):
+    documentation_url = interface.documentation_url
+    if documentation_url is not None:
+        link = massageLink(documentation_url, links)
+    else:
+        link = w.alert('No documentation')
+    w.write('<p>Documentation: %s</p>\n' % link)
+
+
+def soapInterface(w, variant, interface, links, massageLink):
+    name = '%s (SOAP)' % variant.name
+    w.write('<h2>%s</h2>\n' % htmlText(name))
+    wsdl_location = interface.wsdl_location
+    if wsdl_location is None:
+        w.write('<p>%s</p>' % w.alert('No WSDL document'))
+    else:
+        w.write('<p>WSDL: <a href="%s"><code>%s</code></a></p>\n' % (htmlAttr(wsdl_location), htmlText(wsdl_location)))
+    documentation(w, interface, links, massageLink)
+    for operation in interface.operations:
+        soap_operation = operation.resource().soap_operation
+        w.write('<h3>%s</h3>\n' % htmlText(soap_operation.name))
+        if soap_operation.description is None:
+            # This description is usually derived from the top-level
+            # service description. If this description is missing, then
+            # a warning will be emitted for the missing top-level
+            # description, so we do not emit a redundant warning here.
+            # Completing the top-level warning should fix this problem.
+            descriptions = []
+        else:
+            descriptions = [soap_operation.description]
+        for annotation in soap_operation.annotations().annotations.results:
+            if annotation.attribute.identifier == descriptionAttribute:
+                descriptions.append(annotation.value.content)
+        for description in descriptions:
+            w.write('<p>%s</p>\n' % htmlText(description))
+        for heading, kind, parameters in (('Inputs', 'input', soap_operation.inputs), ('Outputs', 'output', soap_operation.outputs)):
+            if parameters:
+                w.write('<h4>%s</h4>\n' % heading)
+                for parameter in parameters:
+                    annotations = getattr(parameter.resource(), 'soap_' + kind).annotations().annotations.results
+                    parameterSection(w, soap_operation.name, kind, parameter, parameter.description is not None, annotations)
+
+
+def restInterface(w, variant, interface, links, massageLink):
+    name = '%s (REST)' % variant.name
+    w.write('<h2>%s</h2>\n' % htmlText(name))
+    documentation(w, interface, links, massageLink)
+    for operation in interface.resources:
+        for method in operation.resource().rest_resource.methods:
+            w.write('<h3>%s</h3>\n' % htmlText(method.endpoint_label))
+            if method.description:
+                w.write('<p>%s</p>\n' % htmlText(method.description))
+            else:
+                w.write('<p>%s</p>' % w.alert('No description'))
+            rest_method = method.resource().rest_method
+            for heading, kind, parameters in (('Inputs', 'input', rest_method.inputs.parameters), ('Outputs', 'output', rest_method.outputs.parameters)):
+                if parameters:
+                    w.write('<h4>%s</h4>\n' % heading)
+                    for parameter in parameters:
+                        annotations = parameter.resource().rest_parameter.annotations().annotations.results
+                        parameterSection(w, method.endpoint_label, kind, parameter, bool(parameter.description), annotations)
+
+
+def parameterSection(w, operationName, kind, parameter, described, annotations):
+    # kind is 'input' or 'output'
+    if described:
+        description = htmlText(parameter.description)
+    else:
+        description = w.alert('No description')
+    w.write('<p><b>%s</b> - %s</p>\n' % (htmlText(parameter.name), description))
+    for annotation in annotations:
+        if annotation.attribute.identifier == exampleAttribute:
+            w.write('<p>Example:\n<code>%s</code></p>\n' % htmlText(annotation.value.content))
+
+
+def evaluation(w, evaluation, topLevel=''):
+    # The maturity level of a MaturityEvaluator.Evaluation, with the actions
+    # needed to reach the next level. topLevel is added when the service is
+    # at the highest level.
+    level = evaluation.level
+    other = evaluation.other
+    if level[0]:
+        w.write('<p>To allow further evaluation, please solve these problems:</p>')
+        for item in level[0]:
+            w.write('<p>- %s</p>\n' % item)
+    elif level[1]:
+        w.write('<p><b>Provisional maturity level: 0</b></p>\n')
+        actions(w, 1, level[1])
+    elif level[2]:
+        w.write('<p><b>Provisional maturity level: 1</b> (subject to manual review)</p>\n')
+        actions(w, 2, level[2])
+    elif level[3]:
+        w.write('<p><b>Provisional maturity level: 2</b> (subject to manual review)</p>\n')
+        actions(w, 3, level[3])
+    else:
+        w.write('<p><b>Provisional maturity level: 3</b> (subject to manual review)</p>\n')
+        w.write(topLevel)
+    if other:
+        w.write('<p>Other issues, not affecting maturity level:</p>\n')
+        for item in other:
+            w.write('<p>- %s</p>\n' % item)
+
+
+def actions(w, target, items):
+    w.write('<p>To obtain level %d, this service requires the following %d actions:</p>\n' % (target, len(items)))
+    for item in items:
+        w.write('<p>- %s</p>\n' % item)
@@ -0,0 +1,92 @@
+import collections
+
+# In-memory caches for parsed catalogue resources. UnboundedCache keeps
+# every resource for the lifetime of the catalogue. LRUCache evicts the least
+# recently used resources once it holds more than maxEntries resources, or
+# more than maxBytes of resources, where the size of a resource is
+# approximated by the length of its JSON body.
+#
+# The caches are not locked; ServiceCatalographer only calls them while
+# holding its own lock.
+
+
+class UnboundedCache:
+
+    def __init__(self):
+        self.entries = {}
+        self.size = 0
+        self.stats = dict(evictions=0, peakEntries=0, peakBytes=0)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return entry[0]
+
+    def put(self, key, value, size):
+        previous = self.entries.get(key)
+        if previous is not None:
+            self.size -= previous[1]
+        self.entries[key] = (value, size)
+        self.size += size
+        self.evict()
+        stats = self.stats
+        stats['peakEntries'] = max(stats['peakEntries'], len(self.entries))
+        stats['peakBytes'] = max(stats['peakBytes'], self.size)
+
+    def evict(self):
+        pass
+
+    def describe(self):
+        return 'unbounded'
+
+
+class LRUCache(UnboundedCache):
+
+    def __init__(self, maxEntries=None, maxBytes=None):
+        super().__init__()
+        self.entries = collections.OrderedDict()
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def full(self):
+        if self.maxEntries is not None and len(self.entries) > self.maxEntries:
+            return True
+        if self.maxBytes is not None and self.size > self.maxBytes:
+            return True
+        return False
+
+    def evict(self):
+        # Always keep the most recent entry, even if it exceeds the budget
+        # on its own
+        while len(self.entries) > 1 and self.full():
+            key, (value, size) = self.entries.popitem(last=False)
+            self.size -= size
+            self.stats['evictions'] += 1
+
+    def describe(self):
+        limits = []
+        if self.maxEntries is not None:
+            limits.append('%d entries' % self.maxEntries)
+        if self.maxBytes is not None:
+            limits.append('%d bytes' % self.maxBytes)
+        return 'LRU, at most %s' % ' and '.join(limits)
+
+
+def makeCache(maxEntries=None, maxBytes=None):
+    if maxEntries is None and maxBytes is None:
+        return UnboundedCache()
+    return LRUCache(maxEntries, maxBytes)
@@ -0,0 +1,106 @@
+import hashlib, json, os, sqlite3, threading
+
+# Persistent storage for catalogue responses, kept between runs so that
+# unchanged resources can be revalidated with a conditional GET instead of
+# being downloaded again. Each entry holds the response body along with the
+# ETag and Last-Modified validators returned by the server.
+
+
+class DirectoryStore:
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def filename(self, url):
+        return os.path.join(self.path, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        try:
+            with open(self.filename(url), 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url:
+            return None
+        return entry
+
+    def put(self, url, etag, lastModified, body):
+        filename = self.filename(url)
+        entry = {
+            'url': url,
+            'etag': etag,
+            'lastModified': lastModified,
+            'body': body
+        }
+        # Write to a temporary file and rename, so that an interrupted run
+        # never leaves a truncated entry behind.
+        tmpname = '%s.%d.tmp' % (filename, threading.get_ident())
+        with open(tmpname, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmpname, filename)
+
+    def delete(self, url):
+        try:
+            os.remove(self.filename(url))
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        pass
+
+
+class SQLiteStore:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS resources (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body TEXT NOT NULL
+            )''')
+        self.db.commit()
+
+    def get(self, url):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT etag, last_modified, body FROM resources WHERE url = ?',
+                (url,)).fetchone()
+        if row is None:
+            return None
+        etag, lastModified, body = row
+        return {
+            'url': url,
+            'etag': etag,
+            'lastModified': lastModified,
+            'body': body
+        }
+
+    def put(self, url, etag, lastModified, body):
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?)',
+                (url, etag, lastModified, body))
+            self.db.commit()
+
+    def delete(self, url):
+        with self.lock:
+            self.db.execute('DELETE FROM resources WHERE url = ?', (url,))
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def openStore(path):
+    # Paths ending in .sqlite or .db use a single SQLite file, anything else
+    # is treated as a directory containing one file per resource.
+    if not path:
+        return None
+    if path.endswith('.sqlite') or path.endswith('.db'):
+        return SQLiteStore(path)
+    return DirectoryStore(path)
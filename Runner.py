@@ -0,0 +1,138 @@
+import contextlib
+
+import Confluence, Fingerprints, Ledger, LinkCache, MarkdownRenderer, Metrics, RenderPool, ResourceCache, ResourceStore, ServiceCatalographer, Snapshot, Tracing, Transport
+import config
+from config import confluenceHost, confluenceUser, confluencePass, serviceCatalographerURL
+from LinkChecker import LinkChecker, documentationLinks
+
+
+class Run:
+
+    # Everything shared by the uploaders during one run: the catalogue and its
+    # services, the documentation link results and the Confluence server. When
+    # the uploaders are given the same Run, the catalogue is crawled and each
+    # link is checked only once.
+
+    def __init__(self, loadSnapshot=None, saveSnapshot=None, incremental=False,
+            force=False, resyncLedger=False, recheckLinks=False):
+        # loadSnapshot renders from a snapshot file without accessing the
+        # catalogue or documentation links. saveSnapshot records this run's
+        # catalogue responses and link results into a snapshot file.
+        # incremental skips services whose catalogue data has not changed
+        # since the previous run. force publishes pages even if the ledger
+        # shows their content is unchanged, and resyncLedger checks the ledger
+        # against the pages currently on the server. recheckLinks checks every
+        # documentation link, even if it was checked recently.
+        Transport.configure(getattr(config, 'httpPoolSize', None), getattr(config, 'httpTimeout', None))
+        self.traceFile = getattr(config, 'traceFile', None)
+        if self.traceFile:
+            Tracing.start()
+        offline = None
+        linkResults = None
+        if loadSnapshot:
+            offline, linkResults = Snapshot.load(loadSnapshot)
+            self.store = None
+        else:
+            self.store = ResourceStore.openStore(getattr(config, 'resourceCache', None))
+        self.recorder = None
+        if saveSnapshot:
+            self.recorder = Snapshot.Writer(saveSnapshot)
+        cache = ResourceCache.makeCache(getattr(config, 'resourceCacheEntries', None), getattr(config, 'resourceCacheBytes', None))
+        self.catalogue = ServiceCatalographer.ServiceCatalographer(serviceCatalographerURL, self.store,
+            getattr(config, 'cataloguePageSize', 50), getattr(config, 'catalogueWorkers', 1), cache,
+            offline, self.recorder)
+        self.linkCache = None
+        linkCacheFile = getattr(config, 'linkCacheFile', None)
+        if linkCacheFile and not loadSnapshot:
+            self.linkCache = LinkCache.LinkCache(linkCacheFile, getattr(config, 'linkSuccessTTL', 7 * 86400),
+                getattr(config, 'linkFailureTTL', 86400), recheckLinks)
+        self.links = LinkChecker(linkResults, offline is not None, self.recorder,
+            getattr(config, 'linkWorkers', 8), getattr(config, 'linkHostConnections', 2),
+            getattr(config, 'linkTimeout', 10), getattr(config, 'linkTitleBytes', 65536),
+            self.linkCache)
+        self.markdown = MarkdownRenderer.MarkdownRenderer(getattr(config, 'markdownCacheFile', None))
+        self.ledger = Ledger.Ledger(getattr(config, 'ledgerFile', None))
+        self.confluence = Confluence.Server(confluenceHost, confluenceUser, confluencePass, self.ledger, force,
+            getattr(config, 'confluenceRate', None))
+        if resyncLedger:
+            try:
+                self.confluence.resyncLedger()
+            except Exception:
+                self.close()
+                raise
+        self.incremental = incremental
+        self.fingerprints = Fingerprints.Fingerprints(getattr(config, 'fingerprintFile', None))
+        self._services = None
+        self._renderPool = None
+
+    def services(self):
+        if self._services is None:
+            with Tracing.span('crawl'):
+                self._services = self.catalogue.getServices()
+        return self._services
+
+    def checkLinks(self, services):
+        # Check the documentation links of all the services at once, rather
+        # than one at a time as each service is reported
+        referrers = {}
+        for service in services:
+            for link in documentationLinks(service):
+                referrers.setdefault(link, []).append(service.self)
+        with Tracing.span('linkcheck'):
+            self.links.checkAll(list(referrers), referrers)
+
+    def renderPool(self):
+        if self._renderPool is None:
+            self._renderPool = RenderPool.RenderPool(self.catalogue, self.links, self.markdown,
+                getattr(config, 'renderWorkers', 1))
+        return self._renderPool
+
+    def publishQueue(self):
+        return Confluence.PublishQueue(self.confluence, getattr(config, 'confluenceWorkers', 1),
+            getattr(config, 'confluenceRetries', 3))
+
+    def finish(self):
+        # Saves the state of the run. The store and snapshot are closed even if
+        # saving fails.
+        try:
+            if self._renderPool is not None:
+                self._renderPool.close()
+            self.fingerprints.save()
+            self.ledger.save()
+            if self.linkCache is not None:
+                self.linkCache.save()
+            self.markdown.save()
+            self.catalogue.printStatistics()
+            self.links.printStatistics()
+            self.markdown.printStatistics()
+            self.confluence.printStatistics()
+            Metrics.metrics.printTable()
+            Metrics.metrics.save(getattr(config, 'metricsJSONFile', None), getattr(config, 'metricsPrometheusFile', None))
+            if self.traceFile:
+                Tracing.tracer.printSummary()
+                Tracing.tracer.save(self.traceFile)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+
+@contextlib.contextmanager
+def session(run=None, **options):
+    # Yields run, or if it is None a new Run made with the given options. A
+    # new Run is finished on leaving, so that what was done, such as the pages
+    # that did publish, is saved even if something fails.
+    if run is not None:
+        yield run
+        return
+    run = Run(**options)
+    try:
+        yield run
+    finally:
+        run.finish()
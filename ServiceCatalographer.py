@@ -1,35 +1,86 @@
-import sys, urllib.parse
+import concurrent.futures, hashlib, json, sys, threading, urllib.parse
+
 import requests
 
+import ResourceCache, Tracing, Transport
 
-requestJSON = {'Accept': 'application/json'}
 
+requestJSON = {'Accept': 'application/json'}
 
-def getAll(requestLink, resultKey=None):
-
-    page = 0
-    totalPages = 1
-    results = []
-    while page < totalPages:
-        params = {
-            'page': page + 1, # URL page numbers are 1-based
-            'per_page': 50
-        }
-        request = requests.get(requestLink, params=params, headers=requestJSON)
-        result = request.json()
-        if len(result) != 1:
-            raise RuntimeError('expected single top-level result')
-        for key in result:
-            # assign the last (and only) key value to the variable 'key'
-            pass
-        assert key == resultKey, key
-        pageResults = result[key]
-        totalPages = pageResults['pages']
-        results.extend(pageResults['results'])
-        page += 1
+# Statuses that mean a resource is not there to fetch, so that asking for it
+# again in the same run would get the same answer
+goneStatuses = (404, 410)
+
+
+def fetchJSON(url):
+
+    response = Transport.get(url, headers=requestJSON)
+    response.raise_for_status()
+    return response.text
+
+
+def getPage(requestLink, resultKey, page, perPage, fetch=fetchJSON):
+
+    params = {
+        'page': page + 1, # URL page numbers are 1-based
+        'per_page': perPage
+    }
+    result = json.loads(fetch(requestLink + '?' + urllib.parse.urlencode(params)))
+    if len(result) != 1:
+        raise RuntimeError('expected single top-level result')
+    for key in result:
+        # assign the last (and only) key value to the variable 'key'
+        pass
+    assert key == resultKey, key
+    return result[key]
+
+
+def getAll(requestLink, resultKey=None, perPage=50, workers=1, fetch=fetchJSON):
+
+    # The first page tells us how many pages there are. The remaining pages
+    # are then requested concurrently, and reassembled in page order.
+    pageResults = getPage(requestLink, resultKey, 0, perPage, fetch)
+    totalPages = pageResults['pages']
+    results = list(pageResults['results'])
+    pages = range(1, totalPages)
+    fetchPage = Tracing.propagate(lambda page: getPage(requestLink, resultKey, page, perPage, fetch))
+    if workers > 1 and len(pages) > 1:
+        with concurrent.futures.ThreadPoolExecutor(min(workers, len(pages))) as executor:
+            for pageResults in executor.map(fetchPage, pages):
+                results.extend(pageResults['results'])
+    else:
+        for pageResults in map(fetchPage, pages):
+            results.extend(pageResults['results'])
     return results
 
 
+def gone(url, status, message):
+
+    # A new error for a resource that was not found earlier, like the one
+    # raised the first time
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    return requests.exceptions.HTTPError(message, response=response)
+
+
+def original(value):
+
+    # Undo the 'annotations' links added by Resource, which depend on which
+    # objects have been wrapped so far
+    if isinstance(value, dict):
+        return {name: original(item) for name, item in value.items()
+            if not (name == 'annotations' and 'self' in value and item == value['self'] + '/annotations')}
+    elif isinstance(value, list):
+        return [original(item) for item in value]
+    return value
+
+
+def canonical(value):
+
+    return json.dumps(original(value), sort_keys=True).encode('utf-8')
+
+
 def convert(result, cache):
 
     if isinstance(result, dict):
@@ -42,31 +93,55 @@ def convert(result, cache):
 
 
 
+# The fields holding links that the reporters follow, and the fields that are
+# not searched for them: a resource's own links, and the variant provided by
+# a deployment, which is only matched against the service's variants
+followedFields = ('resource', 'submitter', 'summary')
+skippedFields = ('self', 'annotations', 'provided_variant')
+
+# The kinds of resource whose annotations the reporters show
+annotatedKinds = ('soap_operation', 'soap_input', 'soap_output', 'rest_parameter')
+
+
+
 class Resource:
 
+    # Each field is converted on first access, and the converted value is
+    # kept in _converted for later accesses to the same field
+    __slots__ = ('_values', '_cache', '_converted')
+
     def __init__(self, result, cache):
 
         self._values = result
         self._cache = cache
+        self._converted = {}
         if 'self' in self._values:
             self._values['annotations'] = self._values['self'] + '/annotations'
 
 
     def __getitem__(self, name):
 
+        converted = self._converted
+        if name in converted:
+            return converted[name]
         result = self._values[name]
         if name != 'self':
             result = convert(result, self._cache)
+        converted[name] = result
         return result
 
 
     def __setitem__(self, name, value):
 
         self._values[name] = value
+        self._converted.pop(name, None)
 
 
     def __getattr__(self, name):
 
+        if name.startswith('_'):
+            # Slots that are not yet set, e.g. during copying or unpickling
+            raise AttributeError(name)
         try:
             return self[name]
         except KeyError:
@@ -96,6 +171,8 @@ class Resource:
 
 class CacheResource(str):
 
+    __slots__ = ('__cache',)
+
     def __new__(cls, data, cache):
         s = str.__new__(cls, data)
         return s
@@ -115,11 +192,42 @@ class NotValidResource(Exception):
 
 
 
+class NotInSnapshot(Exception):
+
+    pass
+
+
+
 class ServiceCatalographer:
 
-    def __init__(self, url):
+    def __init__(self, url, store=None, perPage=50, workers=1, cache=None,
+            offline=None, recorder=None):
         self.url = url
-        self.cache = {}
+        # Listing page size, and the number of concurrent requests used when
+        # fetching the remaining pages of a listing
+        self.perPage = perPage
+        self.workers = workers
+        # In-memory cache of parsed resources (see ResourceCache)
+        if cache is None:
+            cache = ResourceCache.UnboundedCache()
+        self.cache = cache
+        # Futures for resources currently being fetched, keyed by URL
+        self.inflight = {}
+        # The status and message of resources the catalogue does not have,
+        # keyed by URL, so that each costs one request per run. Other errors,
+        # such as timeouts, may not happen again and are not kept.
+        self.failed = {}
+        self.lock = threading.Lock()
+        # Optional persistent store (see ResourceStore) used to revalidate
+        # resources fetched by previous runs
+        self.store = store
+        # When offline is a mapping of URL to response body (see Snapshot),
+        # all responses come from it instead of the network. A recorder
+        # receives every response body, to save them as a snapshot.
+        self.offline = offline
+        self.recorder = recorder
+        self.stats = dict(hits=0, misses=0, revalidated=0, coalesced=0, failed=0, refailed=0)
+        self.failures = []
 
 
     def getFullURL(self, urlStub):
@@ -134,22 +242,225 @@ class ServiceCatalographer:
 
     def getResource(self, resource):
 
-        result = self.cache.get(resource)
-        if result is None:
-            if self.isResource(resource):
-                response = requests.get(resource, headers={'Accept': 'application/json'})
-                response.raise_for_status()
-                result = Resource(response.json(), self)
-                self.cache[resource] = result
-            else:
+        # Concurrent requests for the same resource share a single fetch:
+        # the first caller fetches it, later callers wait for its result.
+        with self.lock:
+            result = self.cache.get(resource)
+            if result is not None:
+                self.stats['hits'] += 1
+                return result
+            if not self.isResource(resource):
                 raise NotValidResource(resource)
+            failure = self.failed.get(resource)
+            if failure is not None:
+                self.stats['refailed'] += 1
+                raise gone(resource, *failure)
+            pending = self.inflight.get(resource)
+            if pending is None:
+                pending = self.inflight[resource] = concurrent.futures.Future()
+                fetching = True
+            else:
+                self.stats['coalesced'] += 1
+                fetching = False
+        if not fetching:
+            return pending.result()
+        try:
+            body = self.fetch(resource)
+            result = Resource(json.loads(body), self)
+        except BaseException as exc:
+            with self.lock:
+                del self.inflight[resource]
+                if isinstance(exc, Exception):
+                    self.stats['failed'] += 1
+                    status = getattr(getattr(exc, 'response', None), 'status_code', None)
+                    if isinstance(exc, requests.exceptions.HTTPError) and status in goneStatuses:
+                        self.failed[resource] = (status, str(exc))
+            pending.set_exception(exc)
+            raise
+        with self.lock:
+            self.cache.put(resource, result, len(body))
+            del self.inflight[resource]
+        pending.set_result(result)
         return result
 
 
-    def getServices(self):
+    def fetch(self, resource):
+
+        if self.offline is not None:
+            body = self.offline.get(resource)
+            if body is None:
+                raise NotInSnapshot(resource)
+            return body
+        body = self.download(resource)
+        if self.recorder is not None:
+            self.recorder.resource(resource, body)
+        return body
+
+
+    def download(self, resource):
+
+        headers = dict(requestJSON)
+        entry = None
+        if self.store is not None:
+            entry = self.store.get(resource)
+            if entry is not None:
+                if entry['etag']:
+                    headers['If-None-Match'] = entry['etag']
+                if entry['lastModified']:
+                    headers['If-Modified-Since'] = entry['lastModified']
+        response = Transport.get(resource, headers=headers)
+        etag = response.headers.get('ETag')
+        lastModified = response.headers.get('Last-Modified')
+        if response.status_code == 304 and entry is not None:
+            self.count('revalidated')
+            # The server may send new validators for the same body
+            if (etag or lastModified) and (etag, lastModified) != (entry['etag'], entry['lastModified']):
+                self.store.put(resource, etag or entry['etag'], lastModified or entry['lastModified'], entry['body'])
+            return entry['body']
+        response.raise_for_status()
+        self.count('misses')
+        body = response.text
+        if self.store is not None:
+            if etag or lastModified:
+                self.store.put(resource, etag, lastModified, body)
+            elif entry is not None:
+                # Without a validator the entry could never be revalidated,
+                # and the old validators belong to an outdated body
+                self.store.delete(resource)
+        return body
+
+
+    def count(self, name):
+
+        with self.lock:
+            self.stats[name] += 1
+
+
+    def printStatistics(self):
+
+        print('Catalogue resources: %(hits)d cache hits, %(misses)d downloaded, %(revalidated)d revalidated, %(coalesced)d duplicate fetches avoided, %(failed)d failed, %(refailed)d repeated failures avoided' % self.stats)
+        for url, exc in self.failures:
+            print('Failed to fetch service %s: %s' % (url, exc))
+        stats = self.cache.stats
+        print('Resource cache (%s): %d entries, %d evictions, peak %d entries, peak %d bytes' % (
+            self.cache.describe(), len(self.cache), stats['evictions'], stats['peakEntries'], stats['peakBytes']))
+
+
+    def links(self, value, kind=None):
+
+        # Yield the catalogue links of a resource that the reporters follow:
+        # the fields in followedFields, and the annotations of the kinds of
+        # resource in annotatedKinds. kind is the name of the field holding
+        # value, which for a whole resource is the kind of resource.
+        if isinstance(value, Resource):
+            value = value._values
+        if isinstance(value, dict):
+            for name, item in value.items():
+                if name in followedFields:
+                    if self.isResource(item):
+                        yield item
+                elif name not in skippedFields and isinstance(item, (dict, list)):
+                    yield from self.links(item, name)
+            if 'self' in value and kind in annotatedKinds:
+                yield value['self'] + '/annotations'
+        elif isinstance(value, list):
+            for item in value:
+                yield from self.links(item, kind)
+
+
+    def tryGetResource(self, resource):
 
-        services = getAll(self.getFullURL('services'), 'services')
-        return [self.getService(service['resource']) for service in services]
+        try:
+            return self.getResource(resource)
+        except Exception:
+            return None
+
+
+    def prefetch(self, resource, depth=5, workers=None):
+
+        # Fetch the resources reachable from a resource, one level of links
+        # at a time, with each level fetched concurrently. Afterwards, walking
+        # the graph up to this depth only hits the cache. The default depth
+        # covers the deepest path followed by the reporters: service, REST
+        # variant, resource, method, parameter, parameter annotations.
+        #
+        # Annotation listings are fetched but not followed, since only their
+        # content is used. Failures are ignored here; they will be raised
+        # again if the resource is really needed.
+        #
+        # Returns (url, resource) for each link found, in a repeatable order,
+        # with None as the resource if it could not be fetched.
+        if workers is None:
+            workers = self.workers
+        seen = set()
+        found = []
+        level = [resource]
+        with concurrent.futures.ThreadPoolExecutor(max(workers, 1)) as executor:
+            for i in range(depth):
+                urls = []
+                for parent in level:
+                    for url in self.links(parent):
+                        if url not in seen:
+                            seen.add(url)
+                            urls.append(url)
+                if not urls:
+                    break
+                resources = list(executor.map(Tracing.propagate(self.tryGetResource), urls))
+                found.extend(zip(urls, resources))
+                level = [child for url, child in zip(urls, resources)
+                    if child is not None and not url.endswith('/annotations')]
+        return found
+
+
+    def fingerprint(self, resource, depth=5):
+
+        # A hash of all catalogue data reachable from a resource, as fetched
+        # by prefetch. It changes whenever any of the data does.
+        digest = hashlib.sha1()
+        digest.update(canonical(resource._values))
+        for url, child in self.prefetch(resource, depth):
+            digest.update(url.encode('utf-8'))
+            if child is not None:
+                digest.update(canonical(child._values))
+        return digest.hexdigest()
+
+
+    def subtree(self, resource, depth=5):
+
+        # The response bodies, keyed by URL, of a resource and everything
+        # prefetch finds from it, so that another ServiceCatalographer can
+        # use them offline
+        bodies = {}
+        for url, child in [(resource.self, self.getResource(resource.self))] + self.prefetch(resource, depth):
+            if child is not None:
+                bodies[url] = json.dumps(original(child._values))
+        return bodies
+
+
+    def getServices(self, workers=None):
+
+        # Services are fetched concurrently, but returned in listing order. A
+        # service that cannot be fetched is left out and recorded in
+        # self.failures, rather than aborting the whole listing.
+        if workers is None:
+            workers = self.workers
+        services = getAll(self.getFullURL('services'), 'services', self.perPage, self.workers, self.fetch)
+        urls = [service['resource'] for service in services]
+        if workers > 1 and len(urls) > 1:
+            with concurrent.futures.ThreadPoolExecutor(min(workers, len(urls))) as executor:
+                services = list(executor.map(Tracing.propagate(self.tryGetService), urls))
+        else:
+            services = [self.tryGetService(url) for url in urls]
+        return [service for service in services if service is not None]
+
+
+    def tryGetService(self, url):
+
+        try:
+            return self.getService(url)
+        except Exception as exc:
+            self.failures.append((url, exc))
+            return None
 
 
     def getService(self, url):
@@ -1,20 +1,42 @@
-import Confluence, ServiceCatalographer, ServiceReporter
-from config import confluenceHost, confluenceUser, confluencePass, serviceCatalographerURL
+import Runner, ServiceReporter, Tracing
 
 # The Wiki space and top-level page to index each service
 # This page will not be modified, but new child pages may be added
 confluenceSpaceKey = 'BioVeL'
 confluenceParentTitle = 'Automatic Service Summary'
 
-def upload():
-    confluence = Confluence.Server(confluenceHost, confluenceUser, confluencePass)
-    bdc = ServiceCatalographer.ServiceCatalographer(serviceCatalographerURL)
-    services = bdc.getServices()
-    for service in services:
-        serviceId = service.self.split('/')[-1]
-        content = ServiceReporter.report(service)
-        print(content)
-        confluence.publish(content, confluenceSpaceKey, 'Service %s (%s) Evaluation' % (serviceId, service.name), confluence.getPageId(confluenceSpaceKey, confluenceParentTitle))
+def upload(run=None):
+    with Runner.session(run) as run:
+        confluence = run.confluence
+        bdc = run.catalogue
+        services = run.services()
+        parentId = confluence.loadChildren(confluenceSpaceKey, confluenceParentTitle)
+        queue = run.publishQueue()
+        stale = []
+        for service in services:
+            with Tracing.service(service.self), Tracing.span('fetch'):
+                fingerprint = bdc.fingerprint(service)
+            if run.incremental and run.fingerprints.unchanged('ServiceUploader', service.self, fingerprint):
+                continue
+            stale.append((service, fingerprint))
+        skipped = len(services) - len(stale)
+        run.checkLinks(service for service, fingerprint in stale)
+        rendered = run.renderPool().map(ServiceReporter, [service for service, fingerprint in stale])
+        maturity = {}
+        for (service, fingerprint), result in zip(stale, rendered):
+            serviceId = service.self.split('/')[-1]
+            content, level = result.result()
+            maturity[level] = maturity.get(level, 0) + 1
+            print(content)
+            pageName = 'Service %s (%s) Evaluation' % (serviceId, service.name)
+            with Tracing.service(service.self):
+                future = queue.submit(content, confluenceSpaceKey, pageName, parentId)
+            run.fingerprints.updateWhenDone(future, 'ServiceUploader', service.self, fingerprint, pageName)
+        queue.wait()
+        print('Service evaluations: %d rebuilt, %d unchanged and skipped' % (len(services) - skipped, skipped))
+        if maturity:
+            print('Maturity of rebuilt services: %s' % ', '.join('level %s: %d' % (level, count)
+                for level, count in sorted(maturity.items(), key=lambda item: (item[0] is None, item[0]))))
 
 if __name__ == '__main__':
     upload()
@@ -0,0 +1,50 @@
+import gzip, json, threading
+
+from LinkChecker import LinkResult
+
+# A snapshot records the catalogue responses and documentation link results
+# of a run, so that the reports can be rendered again later without any
+# network access. The file is gzip-compressed JSON, one record per line:
+#
+#   {"url": "<catalogue URL>", "body": "<JSON response body>"}
+#   {"link": "<documentation URL>", "status": 200, "title": "...", "error": null}
+#
+# If the same URL or link appears more than once, the last record is used.
+
+
+class Writer:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, record):
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            self.file.write(line)
+
+    def resource(self, url, body):
+        self.write({'url': url, 'body': body})
+
+    def link(self, link, result):
+        self.write({'link': link, 'status': result.status, 'title': result.title, 'error': result.error})
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def load(path):
+    # Returns the resource bodies keyed by URL, and the link results keyed by
+    # link
+    resources = {}
+    links = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if 'url' in record:
+                resources[record['url']] = record['body']
+            else:
+                links[record['link']] = LinkResult(record['status'], record['title'], record['error'])
+    return resources, links
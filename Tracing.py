@@ -0,0 +1,131 @@
+import contextlib, contextvars, json, os, threading, time
+
+# Timing spans for the work done on each service: fetching its catalogue
+# data, rendering its pages and publishing them, with the HTTP requests
+# made for each nested inside. Spans are only kept once start() is called.
+# The current span and service are carried in context variables, so work
+# handed to another thread must be wrapped with propagate() to be nested
+# correctly.
+#
+# The spans can be saved in the Chrome trace event format (load the file in
+# chrome://tracing or https://ui.perfetto.dev), and summarised as the
+# slowest services and documentation links. Links are checked for all the
+# services at once, so a 'link' span lists the services showing the link,
+# and its time is counted for each of them.
+
+currentSpan = contextvars.ContextVar('currentSpan', default=None)
+currentService = contextvars.ContextVar('currentService', default=None)
+
+
+class Tracer:
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.events = []
+        self.origin = time.time()
+
+    def record(self, name, start, seconds, args, pid=None, tid=None):
+        with self.lock:
+            self.events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': int((start - self.origin) * 1e6),
+                'dur': int(seconds * 1e6),
+                'pid': pid or os.getpid(),
+                'tid': tid or threading.get_ident(),
+                'args': args
+            })
+
+    def save(self, path):
+        with self.lock:
+            trace = {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+        tmpname = path + '.tmp'
+        with open(tmpname, 'wt', encoding='utf-8') as f:
+            json.dump(trace, f)
+        os.replace(tmpname, path)
+
+    def printSummary(self, count=20):
+        services = {}
+        links = []
+        with self.lock:
+            for event in self.events:
+                args = event['args']
+                if event['name'] in ('fetch', 'render', 'publish') and 'service' in args:
+                    phases = services.setdefault(args['service'], {})
+                    phases[event['name']] = phases.get(event['name'], 0) + event['dur']
+                elif event['name'] == 'link':
+                    links.append((event['dur'], args['link']))
+                    # A link checked while rendering belongs to that service
+                    for service in args.get('services') or ([args['service']] if 'service' in args else []):
+                        phases = services.setdefault(service, {})
+                        phases['link'] = phases.get('link', 0) + event['dur']
+        slowest = sorted(services.items(), key=lambda item: -sum(item[1].values()))[:count]
+        print('Slowest services (seconds):')
+        print('%8s %8s %8s %8s %8s  %s' % ('total', 'fetch', 'links', 'render', 'publish', 'service'))
+        for service, phases in slowest:
+            print('%8.2f %8.2f %8.2f %8.2f %8.2f  %s' % (sum(phases.values()) / 1e6, phases.get('fetch', 0) / 1e6,
+                phases.get('link', 0) / 1e6, phases.get('render', 0) / 1e6, phases.get('publish', 0) / 1e6, service))
+        if links:
+            print('Slowest documentation links (seconds):')
+            for duration, link in sorted(links, reverse=True)[:count]:
+                print('%8.2f  %s' % (duration / 1e6, link))
+
+
+tracer = Tracer()
+
+
+def start():
+    tracer.enabled = True
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    # Time the enclosed block. The span is labelled with the current service,
+    # if there is one.
+    if not tracer.enabled:
+        yield
+        return
+    service = currentService.get()
+    if service is not None:
+        args['service'] = service
+    parent = currentSpan.get()
+    if parent is not None:
+        args['parent'] = parent
+    token = currentSpan.set(name)
+    start = time.time()
+    try:
+        yield
+    finally:
+        currentSpan.reset(token)
+        tracer.record(name, start, time.time() - start, args)
+
+
+@contextlib.contextmanager
+def service(url):
+    # Label the spans in the enclosed block, including those in work handed
+    # to other threads, as belonging to a service
+    token = currentService.set(url)
+    try:
+        yield
+    finally:
+        currentService.reset(token)
+
+
+def propagate(function):
+    # Wrap a function to run in the current span and service, from whichever
+    # thread calls it
+    if not tracer.enabled:
+        return function
+    context = contextvars.copy_context()
+    def run(*args, **kwargs):
+        return context.copy().run(function, *args, **kwargs)
+    return run
+
+
+def timed(function, *args):
+    # Call a function, returning its result with the start time, duration and
+    # process id, for work done in another process
+    start = time.time()
+    result = function(*args)
+    return result, (start, time.time() - start, os.getpid())
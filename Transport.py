@@ -0,0 +1,75 @@
+import threading, time, urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+
+import Metrics, Tracing
+
+# All HTTP traffic (catalogue, documentation links and Confluence) goes
+# through one pooled session per host, so that connections are kept alive
+# between requests instead of paying a TCP and TLS handshake for each call.
+
+poolSize = 10   # connections kept open to each host
+timeout = 60    # seconds, used when a call does not give its own timeout
+
+sessions = {}
+sessionsLock = threading.Lock()
+
+
+def configure(poolSize=None, timeout=None):
+    g = globals()
+    if poolSize is not None:
+        g['poolSize'] = poolSize
+    if timeout is not None:
+        g['timeout'] = timeout
+    # Existing sessions were sized with the old settings
+    with sessionsLock:
+        for session in sessions.values():
+            session.close()
+        sessions.clear()
+
+
+def getSession(url):
+    parts = urllib.parse.urlsplit(url)
+    host = (parts.scheme, parts.netloc)
+    with sessionsLock:
+        session = sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=poolSize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            sessions[host] = session
+    return session
+
+
+def request(method, url, endpoint=None, **kwargs):
+    # endpoint names the request in Metrics; by default it is taken from the
+    # URL. The size of a streamed response is not known here, so the caller
+    # should add the bytes it reads.
+    kwargs.setdefault('timeout', timeout)
+    if endpoint is None:
+        endpoint = Metrics.classify(url)
+    start = time.perf_counter()
+    with Tracing.span('http', endpoint=endpoint):
+        try:
+            response = getSession(url).request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            Metrics.metrics.record(endpoint, time.perf_counter() - start, 'error', 0)
+            raise
+        size = 0
+        if not kwargs.get('stream'):
+            size = len(response.content)
+    Metrics.metrics.record(endpoint, time.perf_counter() - start, response.status_code, size)
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def head(url, **kwargs):
+    return request('HEAD', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
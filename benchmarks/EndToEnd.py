@@ -0,0 +1,157 @@
+# End to end benchmark, using local stand-ins for BiodiversityCatalogue and
+# Confluence
+#
+# Serves a synthetic catalogue (see SyntheticCatalogue.py) and a fake
+# Confluence (see FakeConfluence.py) from a separate process, so that they
+# do not compete with Katoomba for the interpreter, then runs the same steps
+# as ./katoomba. For each phase it reports the wall time, the requests and
+# bytes seen by each server endpoint, and the peak memory use so far.
+#
+# Run from the top-level directory using, for example:
+#   PYTHONPATH=. python3 benchmarks/EndToEnd.py --services 100 --latency 0.01
+# Settings from config.py.in can be changed with --set, e.g.
+#   --set catalogueWorkers=8 --set renderWorkers=4
+
+import argparse, multiprocessing, resource, sys, time, types
+
+import FakeConfluence, SyntheticCatalogue
+
+# Settings used unless changed with --set. Nothing is kept between runs.
+settings = dict(
+    confluenceUser = 'benchmark',
+    confluencePass = 'benchmark',
+    resourceCache = None,
+    fingerprintFile = None,
+    ledgerFile = None,
+    linkCacheFile = None,
+    markdownCacheFile = None
+)
+
+
+def peakRSS():
+    # Peak resident memory of this process and of the largest worker process
+    # that has exited, in bytes (getrusage reports kilobytes on Linux)
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024)
+
+
+def serve(connection, latency, options):
+    # Runs in the server process. Sends the server addresses, then the
+    # request and byte counts whenever asked, until asked to stop.
+    servers = {
+        'catalogue': SyntheticCatalogue.serve(latency=latency, **options),
+        'confluence': FakeConfluence.serve(latency=latency)
+    }
+    connection.send((servers['catalogue'].base, servers['confluence'].host, len(servers['catalogue'].resources)))
+    while connection.recv():
+        counts = {}
+        sizes = {}
+        for name, server in servers.items():
+            with server.lock:
+                for endpoint, count in server.counts.items():
+                    counts[name, endpoint] = count
+                    sizes[name, endpoint] = server.bytes[endpoint]
+        connection.send((counts, sizes))
+
+
+class Phases:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def totals(self):
+        self.connection.send(True)
+        return self.connection.recv()
+
+    def run(self, name, function, *args):
+        counts, sizes = self.totals()
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        newCounts, newSizes = self.totals()
+        rss, childRSS = peakRSS()
+        print('%-8s %8.2f s  peak RSS %6.1f MB (workers %6.1f MB)' % (name, seconds, rss / 1e6, childRSS / 1e6))
+        for key in sorted(newCounts):
+            requests = newCounts[key] - counts.get(key, 0)
+            if requests:
+                print('    %-10s %-20s %6d requests %12d bytes' % (key[0], key[1], requests, newSizes[key] - sizes.get(key, 0)))
+        return result
+
+
+def crawl(run):
+    services = run.services()
+    for service in services:
+        run.catalogue.prefetch(service)
+    return services
+
+
+def render(run, services):
+    import PublicServiceReporter, ServiceReporter
+    pages = []
+    for reporter, space, title in (
+            (ServiceReporter, 'BioVeL', 'Service %(id)s (%(name)s) Evaluation'),
+            (PublicServiceReporter, 'doc', 'BioVeL Service - %(name)s')):
+        futures = run.renderPool().map(reporter, services)
+        for service, future in zip(services, futures):
+            content, level = future.result()
+            names = dict(id=service.self.split('/')[-1], name=service.name)
+            pages.append((content, space, title % names))
+    return pages
+
+
+def publish(run, pages):
+    import PublicServiceUploader, ServiceUploader
+    parents = {}
+    for uploader in (ServiceUploader, PublicServiceUploader):
+        parents[uploader.confluenceSpaceKey] = run.confluence.loadChildren(uploader.confluenceSpaceKey, uploader.confluenceParentTitle)
+    queue = run.publishQueue()
+    for content, space, title in pages:
+        queue.submit(content, space, title, parents[space])
+    queue.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark a Katoomba run against local servers')
+    parser.add_argument('--services', type=int, default=50)
+    parser.add_argument('--variants', type=int, default=2)
+    parser.add_argument('--operations', type=int, default=3)
+    parser.add_argument('--parameters', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0,
+        help='seconds added to every response of both servers')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+        help='change a config.py setting (VALUE is a Python expression)')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    connection, serverConnection = context.Pipe()
+    options = dict(services=args.services, variants=args.variants, operations=args.operations,
+        parameters=args.parameters)
+    server = context.Process(target=serve, args=(serverConnection, args.latency, options), daemon=True)
+    server.start()
+    catalogueURL, confluenceHost, resources = connection.recv()
+
+    # The application reads its settings from the config module
+    config = types.ModuleType('config')
+    config.__dict__.update(settings)
+    config.serviceCatalographerURL = catalogueURL
+    config.confluenceHost = confluenceHost
+    for setting in args.set:
+        name, value = setting.split('=', 1)
+        setattr(config, name, eval(value))
+    sys.modules['config'] = config
+    import Runner
+
+    print('%d services, %d resources, latency %g s' % (args.services, resources, args.latency))
+    phases = Phases(connection)
+    run = Runner.Run()
+    services = phases.run('crawl', crawl, run)
+    phases.run('links', run.checkLinks, services)
+    pages = phases.run('render', render, run, services)
+    phases.run('publish', publish, run, pages)
+    run.finish()
+    connection.send(False)
+    server.join()
+
+
+if __name__ == '__main__':
+    main()
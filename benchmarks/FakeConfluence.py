@@ -0,0 +1,120 @@
+# A stand-in for the Confluence JSON-RPC service, for benchmarks that must
+# not publish to a real wiki.
+#
+# Pages are kept in memory. getPage, getChildren and storePage behave like
+# Confluence closely enough for Confluence.Server: storing a page with an
+# out of date version fails, and failures of storePage can be injected to
+# exercise retries. Set confluenceHost to the server's 'host' to use it.
+
+import json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Pages that must exist before publishing, as (space, title)
+initialPages = [
+    ('BioVeL', 'Automatic Service Summary'),
+    ('doc', 'Supported Services'),
+    ('doc', 'BioVeL Wiki')
+]
+
+
+class ConfluenceHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        method = self.path.rsplit('/', 1)[-1]
+        request = self.rfile.read(int(self.headers['Content-Length']))
+        args = json.loads(request)
+        server = self.server
+        with server.lock:
+            fail = server.failures > 0 and method == 'storePage'
+            if fail:
+                server.failures -= 1
+        if fail:
+            server.record(method, len(request), 0)
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        with server.lock:
+            if method == 'getPage':
+                result = server.getPage(*args)
+            elif method == 'getChildren':
+                result = server.getChildren(*args)
+            elif method == 'storePage':
+                result = server.storePage(*args)
+            else:
+                result = error('Unknown method %s' % method)
+        body = json.dumps(result).encode()
+        server.record(method, len(request), len(body))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def error(message):
+    return {'error': {'code': 500, 'message': message}}
+
+
+class ConfluenceServer(ThreadingHTTPServer):
+
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0):
+        ThreadingHTTPServer.__init__(self, ('127.0.0.1', port), ConfluenceHandler)
+        self.latency = latency
+        self.host = 'http://127.0.0.1:%d' % self.server_address[1]
+        self.lock = threading.Lock()
+        # Number of storePage calls still to fail with 503
+        self.failures = 0
+        self.counts = {}
+        self.bytes = {}
+        self.nextId = 100
+        self.pages = {}
+        for space, title in initialPages:
+            self.nextId += 1
+            self.pages[(space, title)] = dict(id=str(self.nextId), space=space, title=title,
+                version=1, parentId='0', content='')
+
+    def record(self, method, received, sent):
+        with self.lock:
+            self.counts[method] = self.counts.get(method, 0) + 1
+            self.bytes[method] = self.bytes.get(method, 0) + received + sent
+
+    def getPage(self, space, title):
+        page = self.pages.get((space, title))
+        if page is None:
+            return error('No page %s' % title)
+        return dict(page)
+
+    def getChildren(self, parentId):
+        return [dict(id=page['id'], space=page['space'], title=page['title'], parentId=page['parentId'])
+            for page in self.pages.values() if page['parentId'] == parentId]
+
+    def storePage(self, update):
+        key = (update['space'], update['title'])
+        page = self.pages.get(key)
+        if page is None:
+            self.nextId += 1
+            page = dict(id=str(self.nextId), space=update['space'], title=update['title'],
+                version=0, parentId=update['parentId'])
+        elif update.get('id') != page['id'] or str(update.get('version')) != str(page['version']):
+            return error('Version conflict for %s' % update['title'])
+        page = dict(page, content=update['content'], version=page['version'] + 1)
+        self.pages[key] = page
+        return dict(page)
+
+
+def serve(port=0, latency=0):
+    # Start a Confluence server in a background thread
+    server = ConfluenceServer(port, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
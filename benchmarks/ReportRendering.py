@@ -0,0 +1,57 @@
+# Benchmark for rendering the service pages
+#
+# Renders a synthetic service with both reporters, for increasing numbers of
+# parameters per operation. The time per parameter should stay roughly the
+# same as the service grows; a page built by copying the text for every
+# fragment would take longer per parameter as the page gets bigger.
+#
+# Run from the top-level directory using:
+#   PYTHONPATH=. python3 benchmarks/ReportRendering.py [number] [parameters...]
+
+import json, sys, timeit, tracemalloc
+
+import PublicServiceReporter, ServiceReporter, SyntheticCatalogue
+from LinkChecker import LinkChecker, LinkResult, documentationLinks
+from ServiceCatalographer import ServiceCatalographer
+
+
+def render(service, links):
+    ServiceReporter.report(service, links)
+    PublicServiceReporter.report(service, links)
+
+
+def countParameters(resources):
+    return sum(len(value['soap_operation']['inputs']) + len(value['soap_operation']['outputs'])
+            for value in resources.values() if 'soap_operation' in value) + \
+        sum(len(value['rest_method']['inputs']['parameters']) + len(value['rest_method']['outputs']['parameters'])
+            for value in resources.values() if 'rest_method' in value)
+
+
+def allocated(service, links):
+    tracemalloc.start()
+    start, peak = tracemalloc.get_traced_memory()
+    render(service, links)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - start
+
+
+def main(number=5, *sizes):
+    base = 'https://www.biodiversitycatalogue.org/'
+    for size in sizes or (50, 100, 200, 400):
+        resources, listing = SyntheticCatalogue.generate(base, services=1, variants=2, operations=4, parameters=size)
+        offline = {url: json.dumps(value) for url, value in resources.items()}
+        bdc = ServiceCatalographer(base, offline=offline)
+        service = bdc.getServiceId(1)
+        links = LinkChecker({link: LinkResult(200, 'Documentation', None)
+            for link in documentationLinks(service)}, offline=True)
+        # The first rendering fetches the resources
+        render(service, links)
+        seconds = min(timeit.repeat(lambda: render(service, links), number=number, repeat=3)) / number
+        parameters = countParameters(resources)
+        print('%6d parameters: %8.1f ms per service, %6.1f us per parameter, %9d bytes allocated' % (
+            parameters, seconds * 1000, seconds * 1e6 / parameters, allocated(service, links)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,106 @@
+# Micro-benchmark for field access on ServiceCatalographer.Resource
+#
+# Compares the memoizing Resource with the previous implementation, which
+# converted a field on every access, using the access pattern of the
+# reporters (variants iterated twice, each variant resource looked up twice).
+#
+# Run from the top-level directory using:
+#   PYTHONPATH=. python3 benchmarks/ResourceAccess.py
+
+import sys, timeit, tracemalloc
+
+from ServiceCatalographer import CacheResource, Resource, ServiceCatalographer
+
+
+class LegacyResource:
+
+    def __init__(self, result, cache):
+        self._values = result
+        self._cache = cache
+
+    def __getitem__(self, name):
+        result = self._values[name]
+        if name != 'self':
+            result = legacyConvert(result, self._cache)
+        return result
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def legacyConvert(result, cache):
+    if isinstance(result, dict):
+        result = LegacyResource(result, cache)
+    elif isinstance(result, list):
+        result = [legacyConvert(value, cache) for value in result]
+    elif cache.isResource(result):
+        result = CacheResource(result, cache)
+    return result
+
+
+def makeService(base, nvariants, ndeployments):
+    return {
+        'self': base + 'services/1',
+        'name': 'Benchmark service',
+        'submitter': base + 'users/1',
+        'variants': [
+            {'name': 'Variant %d' % i, 'resource': base + 'soap_services/%d' % i}
+            for i in range(nvariants)
+        ],
+        'deployments': [
+            {
+                'resource': base + 'service_deployments/%d' % i,
+                'endpoint': 'http://example.org/%d' % i,
+                'provider': {'name': 'Provider', 'description': 'A provider'}
+            }
+            for i in range(ndeployments)
+        ]
+    }
+
+
+def traverse(service):
+    for variant in service.variants:
+        variant.name
+        variant.resource
+        variant.resource
+    for deployment in service.deployments:
+        deployment.endpoint
+        deployment.provider.name
+        deployment.provider.description
+    for variant in service.variants:
+        variant.name
+        variant.resource
+    service.name
+    service.submitter
+
+
+def allocated(service):
+    # Peak memory allocated by a single traversal, after a first traversal
+    # has had the chance to fill any memo
+    traverse(service)
+    tracemalloc.start()
+    start, peak = tracemalloc.get_traced_memory()
+    traverse(service)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - start
+
+
+def main(number=20000):
+    base = 'https://www.biodiversitycatalogue.org/'
+    bdc = ServiceCatalographer(base)
+    results = {}
+    for name, cls in (('before', LegacyResource), ('after', Resource)):
+        service = cls(makeService(base, 10, 10), bdc)
+        seconds = min(timeit.repeat(lambda: traverse(service), number=number, repeat=3))
+        results[name] = seconds
+        print('%-6s %8.0f traversals/s, %6d bytes allocated per traversal' % (
+            name, number / seconds, allocated(service)))
+    print('speedup %.1fx' % (results['before'] / results['after']))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,191 @@
+# Generates a synthetic BiodiversityCatalogue, for benchmarks that must not
+# depend on the real catalogue.
+#
+# generate() returns the catalogue resources, as a mapping of URL to the JSON
+# value the catalogue would return, and the service listing. Services mix
+# SOAP and REST variants, and some have missing descriptions, documentation,
+# WSDL locations and deployments of unknown variants, so that every branch
+# of the reporters is exercised. serve() serves them over HTTP, counting the
+# requests and response bytes for each kind of resource.
+
+import hashlib, json, threading, time, urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+exampleAttribute = 'http://biodiversitycatalogue.org/attribute/exampledata'
+descriptionAttribute = 'http://biodiversitycatalogue.org/attribute/description'
+
+
+def generate(base, services=3, variants=2, operations=3, parameters=3, docBase=None):
+    # Each variant has 'operations' operations (REST variants have two
+    # methods per resource), each with 'parameters' inputs and outputs.
+    # Documentation links point below docBase.
+    docBase = docBase or base + 'docs/'
+    resources = {}
+    listing = []
+    counter = {}
+
+    def new(kind):
+        counter[kind] = counter.get(kind, 0) + 1
+        return base + '%s/%d' % (kind, counter[kind])
+
+    def annotations(url, n):
+        items = []
+        for k in range(n):
+            items.append({'attribute': {'identifier': exampleAttribute if k % 2 == 0 else descriptionAttribute}, 'value': {'content': 'example %d for %s' % (k, url)}})
+        resources[url + '/annotations'] = {'annotations': {'results': items}}
+
+    for s in range(1, services + 1):
+        svc = base + 'services/%d' % s
+        user = base + 'users/%d' % (s % 3 + 1)
+        resources[user] = {'user': {'name': 'User %d' % (s % 3 + 1), 'affiliation': 'Org' if s % 2 else None, 'public_email': 'u@example.org' if s % 3 else None}}
+        vlist = []
+        dlist = []
+        for v in range(variants):
+            if (s + v) % 2 == 0:
+                vr = new('soap_services')
+                ops = []
+                for o in range(operations):
+                    op = new('soap_operations')
+                    ins = []
+                    outs = []
+                    for p in range(parameters):
+                        i = new('soap_inputs')
+                        resources[i] = {'soap_input': {'self': i}}
+                        annotations(i, p % 3)
+                        ins.append({'name': 'in%d' % p, 'description': None if p % 4 == 3 else 'Input %d' % p, 'resource': i})
+                        out = new('soap_outputs')
+                        resources[out] = {'soap_output': {'self': out}}
+                        annotations(out, (p + 1) % 3)
+                        outs.append({'name': 'out%d' % p, 'description': None if p % 5 == 4 else 'Output %d' % p, 'resource': out})
+                    resources[op] = {'soap_operation': {'self': op, 'name': 'op%d' % o, 'description': None if o % 3 == 2 else 'Operation <%d> & co' % o, 'inputs': ins, 'outputs': outs}}
+                    annotations(op, o % 3)
+                    ops.append({'resource': op})
+                resources[vr] = {'soap_service': {'wsdl_location': None if s % 4 == 0 else vr + '.wsdl', 'documentation_url': None if v % 2 else docBase + 'soap%d' % s, 'operations': ops}}
+            else:
+                vr = new('rest_services')
+                rlist = []
+                for o in range(operations):
+                    rr = new('rest_resources')
+                    methods = []
+                    for m in range(2):
+                        rm = new('rest_methods')
+                        ins = []
+                        outs = []
+                        for p in range(parameters):
+                            i = new('rest_parameters')
+                            resources[i] = {'rest_parameter': {'self': i}}
+                            annotations(i, p % 3)
+                            ins.append({'name': 'p%d' % p, 'description': None if p % 4 == 1 else 'Param\n%d' % p, 'resource': i})
+                            out = new('rest_parameters')
+                            resources[out] = {'rest_parameter': {'self': out}}
+                            annotations(out, 1)
+                            outs.append({'name': 'r%d' % p, 'description': None if p % 3 == 2 else 'Result %d' % p, 'resource': out})
+                        resources[rm] = {'rest_method': {'inputs': {'parameters': ins}, 'outputs': {'parameters': outs}}}
+                        methods.append({'endpoint_label': 'GET /r%d/%d' % (o, m), 'description': None if m else 'Method %d' % m, 'resource': rm})
+                    resources[rr] = {'rest_resource': {'methods': methods}}
+                    rlist.append({'resource': rr})
+                resources[vr] = {'rest_service': {'documentation_url': docBase + 'rest%d' % s if v % 3 else None, 'resources': rlist}}
+            vlist.append({'name': 'Variant %d' % v, 'resource': vr})
+            for d in range(1 + (s + v) % 2):
+                dr = new('service_deployments')
+                resources[dr] = {'service_deployment': {'provided_variant': {'resource': vr, 'description': 'Variant %d' % v}}}
+                dlist.append({'resource': dr, 'endpoint': None if d else 'http://endpoint.example.org/%d/%d' % (s, v), 'provider': {'name': 'Provider %d' % (s % 2), 'description': None if s % 2 else 'A provider'}})
+        if s % 5 == 0:
+            dr = new('service_deployments')
+            resources[dr] = {'service_deployment': {'provided_variant': {'resource': base + 'soap_services/9999', 'description': 'Gone'}}}
+            dlist.append({'resource': dr, 'endpoint': 'http://gone.example.org/', 'provider': {'name': 'Provider', 'description': 'x'}})
+        resources[svc] = {'service': {'self': svc, 'name': 'Service %d' % s, 'description': 'Service *%d* description' % s if s % 2 else None, 'created_at': '2014-0%d-0%dT10:20:30Z' % (s % 9 + 1, s % 9 + 1), 'submitter': user, 'variants': vlist, 'deployments': dlist}}
+        docs = [docBase + 'page%d' % (s % 4), 'notalink%d' % s, 'http://127.0.0.1:1/dead', docBase + 'missing'] [:s % 5]
+        resources[svc + '/summary'] = {'service': {'summary': {
+            'categories': [{'name': 'BioVeL'}, {'name': 'Cat %d' % (s % 3)}] if s % 3 else [],
+            'descriptions': ['Summary description %d' % s] if s % 4 else ['Service %d' % s],
+            'documentation_urls': docs,
+            'licenses': ['GPL'] if s % 2 else [],
+            'contacts': ['contact-%d@example.org' % s] if s % 3 != 1 else [],
+            'publications': ['Pub %d' % s] if s % 2 else [],
+            'citations': [],
+        }}}
+        listing.append({'resource': svc, 'name': 'Service %d' % s})
+    return resources, listing
+
+
+class CatalogueHandler(BaseHTTPRequestHandler):
+
+    # Serves the generated resources as JSON, with ETags, a paginated
+    # service listing and simple HTML documentation pages
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        parts = urllib.parse.urlsplit(self.path)
+        url = self.server.base + parts.path.lstrip('/')
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        endpoint = parts.path.split('/')[1]
+        if parts.path.startswith('/docs/'):
+            if parts.path.endswith('missing'):
+                return self.reply(endpoint, 404, b'')
+            body = ('<html><head><title>Doc %s</title></head><body>%s</body></html>' % (parts.path, 'x' * 1000)).encode()
+            return self.reply(endpoint, 200, body, 'text/html')
+        if parts.path == '/services':
+            perPage = int(query.get('per_page', 50))
+            page = int(query.get('page', 1))
+            results = self.server.listing[(page - 1) * perPage:page * perPage]
+            pages = (len(self.server.listing) + perPage - 1) // perPage
+            value = {'services': {'pages': pages, 'results': results}}
+        elif url in self.server.resources:
+            value = self.server.resources[url]
+        else:
+            return self.reply(endpoint, 404, b'')
+        body = json.dumps(value).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            return self.reply(endpoint, 304, b'', headers={'ETag': etag})
+        self.reply(endpoint, 200, body, 'application/json', {'ETag': etag})
+
+    def reply(self, endpoint, status, body, contentType=None, headers={}):
+        self.server.record(endpoint, len(body))
+        self.send_response(status)
+        if contentType:
+            self.send_header('Content-Type', contentType)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CatalogueServer(ThreadingHTTPServer):
+
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0, **kw):
+        # latency is added to every response, in seconds. Other arguments
+        # are passed to generate().
+        ThreadingHTTPServer.__init__(self, ('127.0.0.1', port), CatalogueHandler)
+        self.latency = latency
+        self.base = 'http://127.0.0.1:%d/' % self.server_address[1]
+        # Documentation is served by the same server, but under another name
+        # so that it is not taken for part of the catalogue
+        kw.setdefault('docBase', 'http://localhost:%d/docs/' % self.server_address[1])
+        self.resources, self.listing = generate(self.base, **kw)
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.bytes = {}
+
+    def record(self, endpoint, size):
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            self.bytes[endpoint] = self.bytes.get(endpoint, 0) + size
+
+
+def serve(port=0, latency=0, **kw):
+    # Start a catalogue server in a background thread
+    server = CatalogueServer(port, latency, **kw)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
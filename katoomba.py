@@ -1,4 +1,40 @@
-import ServiceUploader, PublicServiceUploader
+import argparse
+import CatalogueTables, MaturityExport, PublicServiceUploader, Runner, ServiceUploader
 
-ServiceUploader.upload()
-PublicServiceUploader.upload()
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description='Report BiodiversityCatalogue services to Confluence')
+    parser.add_argument('--save-snapshot', metavar='FILE',
+        help='record catalogue responses and link results into a snapshot file')
+    parser.add_argument('--load-snapshot', metavar='FILE',
+        help='render from a snapshot file instead of the live catalogue')
+    parser.add_argument('--incremental', action='store_true',
+        help='only publish services whose catalogue data changed since the previous run')
+    parser.add_argument('--force', action='store_true',
+        help='publish pages even if their content has not changed since last published')
+    parser.add_argument('--resync-ledger', action='store_true',
+        help='check the record of published pages against Confluence before publishing')
+    parser.add_argument('--recheck-links', action='store_true',
+        help='check every documentation link, even if it was checked recently')
+    parser.add_argument('--evaluate', metavar='FILE',
+        help='write the maturity evaluation of each service to a JSON lines file, instead of publishing pages')
+    parser.add_argument('--tables', metavar='DIRECTORY',
+        help='save tables of the services, operations and parameters with their maturity checks, and print catalogue-wide counts, instead of publishing pages')
+    args = parser.parse_args()
+
+    # Both uploaders share one run, so the catalogue is crawled and the
+    # documentation links are checked once for both sets of pages.
+    with Runner.session(loadSnapshot=args.load_snapshot, saveSnapshot=args.save_snapshot,
+            incremental=args.incremental, force=args.force, resyncLedger=args.resync_ledger,
+            recheckLinks=args.recheck_links) as run:
+        if args.evaluate or args.tables:
+            if args.evaluate:
+                MaturityExport.export(args.evaluate, run)
+            if args.tables:
+                CatalogueTables.export(args.tables, run)
+        else:
+            ServiceUploader.upload(run)
+            PublicServiceUploader.upload(run)
+
+# Guarded, as render worker processes import this module
+if __name__ == '__main__':
+    main()
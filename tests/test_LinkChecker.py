@@ -0,0 +1,43 @@
+import os, sys, threading, unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LinkChecker import LinkChecker
+
+
+class PageHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf8x')
+        self.end_headers()
+        self.wfile.write('<html><head><title>Bogus charset é</title></head></html>'.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+class LinkCheckerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.link = 'http://127.0.0.1:%d/page' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testUnknownCharset(self):
+        # A charset Python does not know is read as UTF-8
+        links = LinkChecker()
+        links.checkAll([self.link])
+        result = links.check(self.link)
+        self.assertEqual(result.status, 200)
+        self.assertEqual(result.title, 'Bogus charset é')
+        self.assertIsNone(result.error)
+
+
+if __name__ == '__main__':
+    unittest.main()